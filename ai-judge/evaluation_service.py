@@ -2,17 +2,147 @@
 Evaluation service using the new processor architecture.
 """
 
+import asyncio
+import hashlib
+import os
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
+import httpx
 import requests
-import json
-from typing import Generator, Optional, Dict, Any
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import orjson
+from typing import AsyncGenerator, AsyncIterable, Generator, Iterable, List, Optional, Dict, Any
 from processors import ProcessorFactory, BaseFileProcessor
 
 
+# Prompt templates are split around the inserted texts so the full prompt
+# can be assembled with a single join instead of nested f-strings.
+SYSTEM_PROMPT = """
+You are an experienced academic reviewer and pedagogue. For every request you must produce exactly two sections in this order:
+
+1) A short free-text reasoning section bracketed by "<THOUGHT>" and "</THOUGHT>". In this section, give concise, specific, reviewer-style notes about the submission (intuition, main strengths/weaknesses you will weigh, and reasoning steps you used). Keep this section focused and specific to the provided document (max ~200-300 words).
+
+2) A machine-readable evaluation bracketed by "<JSON>" and "</JSON>". Output only valid JSON in this block (no extra text). Follow the schema described in the incoming task prompt (the task prompt will request either thesis-only fields or thesis+presentation fields). For each numeric rating, use the requested integer scale. For list fields, return JSON arrays of strings. For boolean fields, use true/false.
+
+Always obey the specific fields, labels and rating scales specified in the task prompt. If the task prompt includes both a thesis and presentation, include the presentation fields. If the task prompt contains only a thesis, omit presentation fields.
+
+Do not output anything else outside the two sections. Be concise and deterministic: set tone professional, neutral, and specific. When you mention weaknesses, be constructive and give concrete ways to improve.
+"""
+
+THESIS_PRESENTATION_PROMPT_HEAD = """
+Instructions:
+Evaluate the following THESIS/DOCUMENT and the PRESENTATION according to the general evaluation criteria below.
+Return two sections exactly as the system prompt requires: <THOUGHT> and <JSON>.
+
+Evaluation criteria (main, general — labels you must use in the JSON):
+1. "Relevance" / "Актуальность темы доклада"
+2. "Literature_and_Originality" / "Полнота обзора и оригинальность"
+3. "Practical_Significance" / "Практическая значимость"
+4. "Presentation_and_QA" / "Качество презентации и ответов на вопросы"
+5. "Author_Contribution" / "Личный вклад автора"
+
+--- DOCUMENT BEGIN ---
+"""
+
+THESIS_PRESENTATION_PROMPT_MIDDLE = """
+--- DOCUMENT END ---
+
+--- PRESENTATION TRANSCRIPT BEGIN ---
+"""
+
+THESIS_PRESENTATION_PROMPT_TAIL = """
+--- PRESENTATION TRANSCRIPT END ---
+
+Please produce:
+- <THOUGHT>: brief, specific notes about reasoning and priorities for scoring the document and presentation (max ~200-300 words).
+- <JSON>: an object with the following fields (in this exact order):
+
+- "Summary": string. Short summary of the paper and its main contributions.
+- "Strengths": [string]. List of strengths.
+- "Weaknesses": [string]. List of weaknesses or missing parts.
+- "Relevance": integer 1-4 (low, medium, high, very high).
+- "Literature_and_Originality": integer 1-4 (low, medium, high, very high).
+- "Practical_Significance": integer 1-4 (low, medium, high, very high).
+- "Author_Contribution": integer 1-4 (low, medium, high, very high).
+- "Presentation_and_QA": integer 1-4 (low, medium, high, very high).
+- "PresentationNotes": [string]. Brief, concrete notes about delivery and answers to questions.
+- "Soundness": integer 1-4 (poor, fair, good, excellent).
+- "Questions": [string]. Clarifying questions for the authors.
+- "Limitations": [string]. Limitations and possible negative societal impacts.
+- "Ethical_Concerns": boolean.
+- "Overall": integer 1-10 (1 = Very Strong Reject, 2 = Strong Reject, 3 = Reject, 4 = Borderline reject, 5 = Borderline, 6 = Weak Accept, 7 = Accept, 8 = Strong Accept, 9 = Very Strong Accept, 10 = Award quality).
+- "Confidence": integer 1-5 (low, medium, high, very high, absolute).
+- "Decision": string, one of ["Accept", "Reject"].
+
+Return only the two required blocks. Do not add extra commentary.
+"""
+
+THESIS_ONLY_PROMPT_HEAD = """
+Instructions:
+Evaluate the following THESIS/DOCUMENT according to the general evaluation criteria below.
+Return two sections exactly as the system prompt requires: <THOUGHT> and <JSON>.
+
+Evaluation criteria (main, general — translated and written as labels you must use in the JSON):
+1. "Relevance" / "Актуальность темы доклада" — How relevant the topic is to current challenges in the field.
+2. "Literature_and_Originality" / "Полнота обзора и оригинальность" — Completeness of literature review, analysis of prior solutions and their shortcomings, and the originality/novelty / theoretical significance of the proposed solution.
+3. "Practical_Significance" / "Практическая значимость" — Practical impact and the feasibility/quality of practical implementation (if applicable).
+4. "Author_Contribution" / "Личный вклад автора" — Degree of author's personal contribution to the solution.
+5. "PresentationQuality" is NOT required in this variant (omit presentation fields).
+
+--- DOCUMENT BEGIN ---
+"""
+
+THESIS_ONLY_PROMPT_TAIL = """
+--- DOCUMENT END ---
+
+Please produce:
+- <THOUGHT>: brief, specific notes about reasoning and priorities for scoring this document.
+- <JSON>: an object with the following fields (in this exact order):
+
+- "Summary": string. Short summary of the paper and its main contributions.
+- "Strengths": [string]. List of strengths.
+- "Weaknesses": [string]. List of weaknesses or missing parts.
+- "Relevance": integer 1-4 (low, medium, high, very high).
+- "Literature_and_Originality": integer 1-4 (low, medium, high, very high).
+- "Practical_Significance": integer 1-4 (low, medium, high, very high).
+- "Author_Contribution": integer 1-4 (low, medium, high, very high).
+- "Soundness": integer 1-4 (poor, fair, good, excellent).
+- "Questions": [string]. Clarifying questions for the authors.
+- "Limitations": [string]. Limitations and possible negative societal impacts.
+- "Ethical_Concerns": boolean.
+- "Overall": integer 1-10 (1 = Very Strong Reject, 2 = Strong Reject, 3 = Reject, 4 = Borderline reject, 5 = Borderline, 6 = Weak Accept, 7 = Accept, 8 = Strong Accept, 9 = Very Strong Accept, 10 = Award quality).
+- "Confidence": integer 1-5 (low, medium, high, very high, absolute).
+- "Decision": string, one of ["Accept", "Reject"].
+
+Return only the two required blocks. Do not add extra commentary.
+"""
+
+# System prompt with its separator, prepended to every task prompt
+SYSTEM_HEADER = SYSTEM_PROMPT + "\n\n"
+
+
 class EvaluationService:
     """Service for evaluating documents and presentations."""
     
+    # Generation options sent to Ollama; part of the result cache key
+    GENERATION_OPTIONS = {
+        "temperature": 0.0,
+        "num_predict": 2500
+    }
+    
+    # Size of the pieces a cached response is re-streamed in
+    CACHED_STREAM_CHUNK = 64
+    
+    # Result cache bounds: entries expire after CACHE_TTL seconds, at most CACHE_MAX_ROWS are kept
+    CACHE_TTL = 7 * 24 * 3600
+    CACHE_MAX_ROWS = 1000
+    
     def __init__(self, vision_model: str = "llava", eval_model: str = "llama3.2", 
-                 ollama_base_url: str = "http://localhost:11434"):
+                 ollama_base_url: str = "http://localhost:11434",
+                 vision_workers: int = 8, cache_path: Optional[str] = None):
         """
         Initialize evaluation service.
         
@@ -20,10 +150,27 @@ class EvaluationService:
             vision_model: Model for image description
             eval_model: Model for evaluation
             ollama_base_url: Base URL for Ollama API
+            vision_workers: Number of concurrent image description requests
+            cache_path: SQLite file for cached evaluation results
+                (defaults to $AI_JUDGE_CACHE or /tmp/ai_judge_cache.sqlite)
         """
         self.vision_model = vision_model
         self.eval_model = eval_model
         self.ollama_base_url = ollama_base_url.rstrip('/')
+        self.vision_workers = vision_workers
+        self.cache_path = cache_path or os.environ.get("AI_JUDGE_CACHE", "/tmp/ai_judge_cache.sqlite")
+        # Keep-alive connection pool shared with the presentation processor's vision calls
+        self._http = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=32, pool_maxsize=max(32, vision_workers + 1),
+            max_retries=Retry(total=2, backoff_factor=0.1)
+        )
+        self._http.mount("http://", adapter)
+        self._http.mount("https://", adapter)
+        # Created lazily by the async evaluation paths
+        self._aclient: Optional[httpx.AsyncClient] = None
+        # Set once the cache schema has been created for this instance
+        self._cache_schema_ready = False
     
     def evaluate_document(self, doc_path: str, presentation_path: Optional[str] = None) -> str:
         """
@@ -36,27 +183,7 @@ class EvaluationService:
         Returns:
             Evaluation result
         """
-        # Process document
-        doc_processor = ProcessorFactory.create_processor(doc_path)
-        doc_text = doc_processor.process()
-        
-        # Process presentation if provided
-        presentation_text = ""
-        if presentation_path:
-            pptx_processor = ProcessorFactory.create_processor(
-                presentation_path, 
-                vision_model=self.vision_model,
-                ollama_base_url=self.ollama_base_url
-            )
-            presentation_text = pptx_processor.process()
-        
-        # Build prompt and evaluate
-        if presentation_text:
-            task_prompt = self._build_thesis_presentation_prompt(doc_text, presentation_text)
-        else:
-            task_prompt = self._build_thesis_only_prompt(doc_text)
-        
-        full_prompt = f"{self._system_prompt()}\n\n{task_prompt}"
+        full_prompt = self._build_full_prompt(doc_path, presentation_path)
         
         return self._call_evaluation_model(full_prompt)
     
@@ -71,52 +198,144 @@ class EvaluationService:
         Yields:
             Evaluation result chunks
         """
-        # Process document
+        full_prompt = self._build_full_prompt(doc_path, presentation_path)
+        
+        yield from self._call_evaluation_model_stream(full_prompt)
+    
+    async def aevaluate_document(self, doc_path: str, presentation_path: Optional[str] = None) -> str:
+        """
+        Evaluate document and optionally presentation without blocking the event loop.
+        
+        Args:
+            doc_path: Path to document file
+            presentation_path: Optional path to presentation file
+            
+        Returns:
+            Evaluation result
+        """
+        # File processing is blocking (parsing, vision requests), run it in a worker thread
+        full_prompt = await asyncio.to_thread(self._build_full_prompt, doc_path, presentation_path)
+        
+        return await self._acall_evaluation_model(full_prompt)
+    
+    async def aevaluate_document_stream(self, doc_path: str, presentation_path: Optional[str] = None) -> AsyncGenerator[str, None]:
+        """
+        Stream evaluation results without blocking the event loop.
+        
+        Args:
+            doc_path: Path to document file
+            presentation_path: Optional path to presentation file
+            
+        Yields:
+            Evaluation result chunks
+        """
+        # File processing is blocking (parsing, vision requests), run it in a worker thread
+        full_prompt = await asyncio.to_thread(self._build_full_prompt, doc_path, presentation_path)
+        
+        async for chunk in self._acall_evaluation_model_stream(full_prompt):
+            yield chunk
+    
+    async def aclose(self) -> None:
+        """Close the async HTTP client if it was created."""
+        if self._aclient is not None:
+            await self._aclient.aclose()
+            self._aclient = None
+    
+    def _build_full_prompt(self, doc_path: str, presentation_path: Optional[str] = None) -> str:
+        """Process input files and build the full evaluation prompt."""
         doc_processor = ProcessorFactory.create_processor(doc_path)
-        doc_text = doc_processor.process()
         
-        # Process presentation if provided
+        # Process presentation if provided, overlapping it with the document
         presentation_text = ""
         if presentation_path:
             pptx_processor = ProcessorFactory.create_processor(
                 presentation_path,
                 vision_model=self.vision_model,
-                ollama_base_url=self.ollama_base_url
+                ollama_base_url=self.ollama_base_url,
+                vision_workers=self.vision_workers,
+                session=self._http
             )
-            presentation_text = pptx_processor.process()
+            with ThreadPoolExecutor(max_workers=2) as executor:
+                doc_future = executor.submit(doc_processor.process)
+                presentation_future = executor.submit(pptx_processor.process)
+                doc_text = doc_future.result()
+                presentation_text = presentation_future.result()
+        else:
+            doc_text = doc_processor.process()
         
-        # Build prompt and evaluate
+        # Build prompt with a single join so the large texts are copied once
         if presentation_text:
-            task_prompt = self._build_thesis_presentation_prompt(doc_text, presentation_text)
+            task_parts = [
+                THESIS_PRESENTATION_PROMPT_HEAD, doc_text,
+                THESIS_PRESENTATION_PROMPT_MIDDLE, presentation_text,
+                THESIS_PRESENTATION_PROMPT_TAIL
+            ]
         else:
-            task_prompt = self._build_thesis_only_prompt(doc_text)
+            task_parts = [THESIS_ONLY_PROMPT_HEAD, doc_text, THESIS_ONLY_PROMPT_TAIL]
         
-        full_prompt = f"{self._system_prompt()}\n\n{task_prompt}"
-        
-        yield from self._call_evaluation_model_stream(full_prompt)
+        return "".join([SYSTEM_HEADER, *task_parts])
     
     def _call_evaluation_model(self, prompt: str) -> str:
         """Call evaluation model with prompt."""
+        cache_key = self._cache_key(prompt)
+        cached = self._cache_get(cache_key)
+        if cached is not None:
+            return cached
+        
         try:
             payload = {
                 "model": self.eval_model,
                 "prompt": prompt,
                 "stream": False,
-                "options": {
-                    "temperature": 0.0,
-                    "num_predict": 2500
-                }
+                "options": self.GENERATION_OPTIONS
             }
 
-            response = requests.post(
+            response = self._http.post(
                 f"{self.ollama_base_url}/api/generate",
-                json=payload,
+                data=orjson.dumps(payload),
+                headers={"Content-Type": "application/json"},
                 timeout=300
             )
             
             if response.status_code == 200:
-                result = response.json()
-                return result.get("response", "Evaluation failed")
+                result = orjson.loads(response.content)
+                if "response" not in result:
+                    return "Evaluation failed"
+                self._cache_put(cache_key, result["response"])
+                return result["response"]
+            else:
+                return f"Error: {response.status_code} - {response.text}"
+                
+        except Exception as e:
+            return f"Error during evaluation: {str(e)}"
+    
+    async def _acall_evaluation_model(self, prompt: str) -> str:
+        """Call evaluation model over the async HTTP client."""
+        cache_key = self._cache_key(prompt)
+        cached = await asyncio.to_thread(self._cache_get, cache_key)
+        if cached is not None:
+            return cached
+        
+        try:
+            payload = {
+                "model": self.eval_model,
+                "prompt": prompt,
+                "stream": False,
+                "options": self.GENERATION_OPTIONS
+            }
+
+            response = await self._get_aclient().post(
+                f"{self.ollama_base_url}/api/generate",
+                content=orjson.dumps(payload),
+                headers={"Content-Type": "application/json"}
+            )
+            
+            if response.status_code == 200:
+                result = orjson.loads(response.content)
+                if "response" not in result:
+                    return "Evaluation failed"
+                await asyncio.to_thread(self._cache_put, cache_key, result["response"])
+                return result["response"]
             else:
                 return f"Error: {response.status_code} - {response.text}"
                 
@@ -125,140 +344,189 @@ class EvaluationService:
     
     def _call_evaluation_model_stream(self, prompt: str) -> Generator[str, None, None]:
         """Call evaluation model with streaming."""
+        cache_key = self._cache_key(prompt)
+        cached = self._cache_get(cache_key)
+        if cached is not None:
+            yield from self._chunk_cached(cached)
+            return
+        
         try:
             payload = {
                 "model": self.eval_model,
                 "prompt": prompt,
                 "stream": True,
-                "options": {
-                    "temperature": 0.0,
-                    "num_predict": 2500
-                }
+                "options": self.GENERATION_OPTIONS
             }
 
-            response = requests.post(
+            response = self._http.post(
                 f"{self.ollama_base_url}/api/generate",
-                json=payload,
+                data=orjson.dumps(payload),
+                headers={"Content-Type": "application/json"},
                 stream=True,
                 timeout=300
             )
             
             if response.status_code == 200:
-                for line in response.iter_lines():
-                    if line:
-                        try:
-                            data = json.loads(line.decode('utf-8'))
-                            if 'response' in data:
-                                yield data['response']
-                            if data.get('done', False):
-                                break
-                        except json.JSONDecodeError:
-                            continue
+                parts = []
+                for data in self._iter_ndjson(response.iter_content(chunk_size=8192)):
+                    if 'response' in data:
+                        parts.append(data['response'])
+                        yield data['response']
+                    if data.get('done', False):
+                        # Only complete generations are cached
+                        self._cache_put(cache_key, "".join(parts))
+                        break
             else:
                 yield f"Error: {response.status_code} - {response.text}"
                 
         except Exception as e:
             yield f"Error during evaluation: {str(e)}"
     
-    @staticmethod
-    def _system_prompt() -> str:
-        """Get system prompt for evaluation."""
-        return """
-You are an experienced academic reviewer and pedagogue. For every request you must produce exactly two sections in this order:
-
-1) A short free-text reasoning section bracketed by "<THOUGHT>" and "</THOUGHT>". In this section, give concise, specific, reviewer-style notes about the submission (intuition, main strengths/weaknesses you will weigh, and reasoning steps you used). Keep this section focused and specific to the provided document (max ~200-300 words).
-
-2) A machine-readable evaluation bracketed by "<JSON>" and "</JSON>". Output only valid JSON in this block (no extra text). Follow the schema described in the incoming task prompt (the task prompt will request either thesis-only fields or thesis+presentation fields). For each numeric rating, use the requested integer scale. For list fields, return JSON arrays of strings. For boolean fields, use true/false.
-
-Always obey the specific fields, labels and rating scales specified in the task prompt. If the task prompt includes both a thesis and presentation, include the presentation fields. If the task prompt contains only a thesis, omit presentation fields.
+    async def _acall_evaluation_model_stream(self, prompt: str) -> AsyncGenerator[str, None]:
+        """Call evaluation model with streaming over the async HTTP client."""
+        cache_key = self._cache_key(prompt)
+        cached = await asyncio.to_thread(self._cache_get, cache_key)
+        if cached is not None:
+            for chunk in self._chunk_cached(cached):
+                yield chunk
+            return
+        
+        try:
+            payload = {
+                "model": self.eval_model,
+                "prompt": prompt,
+                "stream": True,
+                "options": self.GENERATION_OPTIONS
+            }
 
-Do not output anything else outside the two sections. Be concise and deterministic: set tone professional, neutral, and specific. When you mention weaknesses, be constructive and give concrete ways to improve.
-"""
+            async with self._get_aclient().stream(
+                "POST",
+                f"{self.ollama_base_url}/api/generate",
+                content=orjson.dumps(payload),
+                headers={"Content-Type": "application/json"}
+            ) as response:
+                if response.status_code == 200:
+                    parts = []
+                    async for data in self._aiter_ndjson(response.aiter_bytes()):
+                        if 'response' in data:
+                            parts.append(data['response'])
+                            yield data['response']
+                        if data.get('done', False):
+                            # Only complete generations are cached
+                            await asyncio.to_thread(self._cache_put, cache_key, "".join(parts))
+                            break
+                else:
+                    body = await response.aread()
+                    yield f"Error: {response.status_code} - {body.decode('utf-8', errors='replace')}"
+                
+        except Exception as e:
+            yield f"Error during evaluation: {str(e)}"
     
-    @staticmethod
-    def _build_thesis_presentation_prompt(doc_text: str, presentation_text: str) -> str:
-        """Build prompt for thesis and presentation evaluation."""
-        return f"""
-Instructions:
-Evaluate the following THESIS/DOCUMENT and the PRESENTATION according to the general evaluation criteria below.
-Return two sections exactly as the system prompt requires: <THOUGHT> and <JSON>.
-
-Evaluation criteria (main, general — labels you must use in the JSON):
-1. "Relevance" / "Актуальность темы доклада"
-2. "Literature_and_Originality" / "Полнота обзора и оригинальность"
-3. "Practical_Significance" / "Практическая значимость"
-4. "Presentation_and_QA" / "Качество презентации и ответов на вопросы"
-5. "Author_Contribution" / "Личный вклад автора"
-
---- DOCUMENT BEGIN ---
-{doc_text}
---- DOCUMENT END ---
-
---- PRESENTATION TRANSCRIPT BEGIN ---
-{presentation_text}
---- PRESENTATION TRANSCRIPT END ---
-
-Please produce:
-- <THOUGHT>: brief, specific notes about reasoning and priorities for scoring the document and presentation (max ~200-300 words).
-- <JSON>: an object with the following fields (in this exact order):
-
-- "Summary": string. Short summary of the paper and its main contributions.
-- "Strengths": [string]. List of strengths.
-- "Weaknesses": [string]. List of weaknesses or missing parts.
-- "Relevance": integer 1-4 (low, medium, high, very high).
-- "Literature_and_Originality": integer 1-4 (low, medium, high, very high).
-- "Practical_Significance": integer 1-4 (low, medium, high, very high).
-- "Author_Contribution": integer 1-4 (low, medium, high, very high).
-- "Presentation_and_QA": integer 1-4 (low, medium, high, very high).
-- "PresentationNotes": [string]. Brief, concrete notes about delivery and answers to questions.
-- "Soundness": integer 1-4 (poor, fair, good, excellent).
-- "Questions": [string]. Clarifying questions for the authors.
-- "Limitations": [string]. Limitations and possible negative societal impacts.
-- "Ethical_Concerns": boolean.
-- "Overall": integer 1-10 (1 = Very Strong Reject, 2 = Strong Reject, 3 = Reject, 4 = Borderline reject, 5 = Borderline, 6 = Weak Accept, 7 = Accept, 8 = Strong Accept, 9 = Very Strong Accept, 10 = Award quality).
-- "Confidence": integer 1-5 (low, medium, high, very high, absolute).
-- "Decision": string, one of ["Accept", "Reject"].
-
-Return only the two required blocks. Do not add extra commentary.
-"""
+    def _get_aclient(self) -> httpx.AsyncClient:
+        """Return the shared async HTTP client, creating it on first use."""
+        if self._aclient is None:
+            self._aclient = httpx.AsyncClient(
+                timeout=300,
+                limits=httpx.Limits(max_connections=32, max_keepalive_connections=32)
+            )
+        return self._aclient
+    
+    def _cache_key(self, prompt: str) -> str:
+        """Build the result cache key from the prompt and every generation parameter."""
+        options = orjson.dumps(self.GENERATION_OPTIONS, option=orjson.OPT_SORT_KEYS).decode()
+        key_source = "\x00".join([self.ollama_base_url, self.eval_model, self.vision_model, options, prompt])
+        return hashlib.sha256(key_source.encode("utf-8")).hexdigest()
+    
+    def _cache_connect(self) -> sqlite3.Connection:
+        """Open the result cache database, creating the table on first use."""
+        conn = sqlite3.connect(self.cache_path, timeout=5)
+        if not self._cache_schema_ready:
+            try:
+                # The unbounded table of earlier versions is superseded; its keys lack the Ollama URL
+                conn.execute("DROP TABLE IF EXISTS evaluations")
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS evaluation_cache "
+                    "(key TEXT PRIMARY KEY, response TEXT NOT NULL, created_at REAL NOT NULL)"
+                )
+                conn.execute("CREATE INDEX IF NOT EXISTS evaluation_cache_created_at ON evaluation_cache (created_at)")
+            except sqlite3.Error:
+                conn.close()
+                raise
+            self._cache_schema_ready = True
+        return conn
+    
+    def _cache_get(self, key: str) -> Optional[str]:
+        """Return a cached evaluation result, or None on miss or cache failure."""
+        try:
+            with closing(self._cache_connect()) as conn:
+                row = conn.execute(
+                    "SELECT response FROM evaluation_cache WHERE key = ? AND created_at >= ?",
+                    (key, time.time() - self.CACHE_TTL)
+                ).fetchone()
+        except sqlite3.Error:
+            return None
+        return row[0] if row else None
+    
+    def _cache_put(self, key: str, response: str) -> None:
+        """Store an evaluation result and prune expired or excess entries; cache failures are ignored."""
+        now = time.time()
+        try:
+            with closing(self._cache_connect()) as conn, conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO evaluation_cache (key, response, created_at) VALUES (?, ?, ?)",
+                    (key, response, now)
+                )
+                conn.execute("DELETE FROM evaluation_cache WHERE created_at < ?", (now - self.CACHE_TTL,))
+                conn.execute(
+                    "DELETE FROM evaluation_cache WHERE key IN "
+                    "(SELECT key FROM evaluation_cache ORDER BY created_at DESC LIMIT -1 OFFSET ?)",
+                    (self.CACHE_MAX_ROWS,)
+                )
+        except sqlite3.Error:
+            pass
+    
+    @classmethod
+    def _chunk_cached(cls, text: str) -> Generator[str, None, None]:
+        """Split a cached response into chunks to keep the streaming behaviour."""
+        for start in range(0, len(text), cls.CACHED_STREAM_CHUNK):
+            yield text[start:start + cls.CACHED_STREAM_CHUNK]
     
     @staticmethod
-    def _build_thesis_only_prompt(doc_text: str) -> str:
-        """Build prompt for thesis-only evaluation."""
-        return f"""
-Instructions:
-Evaluate the following THESIS/DOCUMENT according to the general evaluation criteria below.
-Return two sections exactly as the system prompt requires: <THOUGHT> and <JSON>.
-
-Evaluation criteria (main, general — translated and written as labels you must use in the JSON):
-1. "Relevance" / "Актуальность темы доклада" — How relevant the topic is to current challenges in the field.
-2. "Literature_and_Originality" / "Полнота обзора и оригинальность" — Completeness of literature review, analysis of prior solutions and their shortcomings, and the originality/novelty / theoretical significance of the proposed solution.
-3. "Practical_Significance" / "Практическая значимость" — Practical impact and the feasibility/quality of practical implementation (if applicable).
-4. "Author_Contribution" / "Личный вклад автора" — Degree of author's personal contribution to the solution.
-5. "PresentationQuality" is NOT required in this variant (omit presentation fields).
-
---- DOCUMENT BEGIN ---
-{doc_text}
---- DOCUMENT END ---
-
-Please produce:
-- <THOUGHT>: brief, specific notes about reasoning and priorities for scoring this document.
-- <JSON>: an object with the following fields (in this exact order):
-
-- "Summary": string. Short summary of the paper and its main contributions.
-- "Strengths": [string]. List of strengths.
-- "Weaknesses": [string]. List of weaknesses or missing parts.
-- "Relevance": integer 1-4 (low, medium, high, very high).
-- "Literature_and_Originality": integer 1-4 (low, medium, high, very high).
-- "Practical_Significance": integer 1-4 (low, medium, high, very high).
-- "Author_Contribution": integer 1-4 (low, medium, high, very high).
-- "Soundness": integer 1-4 (poor, fair, good, excellent).
-- "Questions": [string]. Clarifying questions for the authors.
-- "Limitations": [string]. Limitations and possible negative societal impacts.
-- "Ethical_Concerns": boolean.
-- "Overall": integer 1-10 (1 = Very Strong Reject, 2 = Strong Reject, 3 = Reject, 4 = Borderline reject, 5 = Borderline, 6 = Weak Accept, 7 = Accept, 8 = Strong Accept, 9 = Very Strong Accept, 10 = Award quality).
-- "Confidence": integer 1-5 (low, medium, high, very high, absolute).
-- "Decision": string, one of ["Accept", "Reject"].
-
-Return only the two required blocks. Do not add extra commentary.
-"""
+    def _pop_ndjson_lines(buffer: bytearray) -> List[Dict[str, Any]]:
+        """Remove complete lines from the buffer and parse them, skipping malformed ones."""
+        end = buffer.rfind(b"\n")
+        if end < 0:
+            return []
+        lines = buffer[:end].split(b"\n")
+        del buffer[:end + 1]
+        
+        objects = []
+        for line in lines:
+            if line.strip():
+                try:
+                    objects.append(orjson.loads(line))
+                except orjson.JSONDecodeError:
+                    continue
+        return objects
+    
+    @classmethod
+    def _iter_ndjson(cls, chunks: Iterable[bytes]) -> Generator[Dict[str, Any], None, None]:
+        """Parse an NDJSON byte stream read in large chunks."""
+        buffer = bytearray()
+        for chunk in chunks:
+            buffer += chunk
+            yield from cls._pop_ndjson_lines(buffer)
+        buffer += b"\n"
+        yield from cls._pop_ndjson_lines(buffer)
+    
+    @classmethod
+    async def _aiter_ndjson(cls, chunks: AsyncIterable[bytes]) -> AsyncGenerator[Dict[str, Any], None]:
+        """Parse an async NDJSON byte stream read in large chunks."""
+        buffer = bytearray()
+        async for chunk in chunks:
+            buffer += chunk
+            for data in cls._pop_ndjson_lines(buffer):
+                yield data
+        buffer += b"\n"
+        for data in cls._pop_ndjson_lines(buffer):
+            yield data
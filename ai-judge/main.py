@@ -1,12 +1,17 @@
+import io
 import os
+import asyncio
+import contextlib
+import time
+import httpx
+import orjson
 import shutil
 import uuid
 from fastapi import FastAPI, File, UploadFile, Form
 from fastapi.responses import StreamingResponse, JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
-from tempfile import TemporaryDirectory
-from typing import Optional
-import asyncio
+from starlette.concurrency import run_in_threadpool
+from typing import Dict, Any
 
 from evaluation_service import EvaluationService
 from utils import setup_logging, log_error, log_info
@@ -16,6 +21,17 @@ logger = setup_logging()
 
 app = FastAPI(title="Thesis & Presentation Evaluator API")
 
+# Буфер между потоком Ollama и SSE-клиентом
+STREAM_QUEUE_SIZE = 128
+_STREAM_END = object()
+
+# Кеш ответа Ollama /api/tags для /models/ и /health/
+OLLAMA_URL = "http://212.8.228.176:9000"
+TAGS_CACHE_TTL = 5.0
+FALLBACK_MODELS = ["llama3.2", "llava", "mistral", "phi3"]
+_tags_cache: Dict[str, Any] = {"ts": float("-inf"), "models": None, "status_code": None, "error": None}
+_tags_lock = asyncio.Lock()
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -24,6 +40,28 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+def _save_upload(upload: UploadFile, path: str) -> None:
+    """Сохраняет загруженный файл, по возможности копируя его на стороне ядра"""
+    src = upload.file
+    src.seek(0)
+    with open(path, "wb") as f:
+        try:
+            src_fd = src.fileno() if hasattr(os, "sendfile") else None
+        except (io.UnsupportedOperation, OSError):
+            src_fd = None  # Поток без файлового дескриптора
+        if src_fd is None:
+            shutil.copyfileobj(src, f, 1 << 20)
+            return
+
+        size = os.fstat(src_fd).st_size
+        offset = 0
+        while offset < size:
+            sent = os.sendfile(f.fileno(), src_fd, offset, size - offset)
+            if sent == 0:
+                break
+            offset += sent
+
+
 @app.post("/evaluate/")
 async def evaluate_thesis_and_presentation(
     docx_file: UploadFile = File(...),
@@ -46,13 +84,11 @@ async def evaluate_thesis_and_presentation(
     
     try:
         # Сохраняем DOCX файл
-        with open(docx_path, "wb") as f:
-            shutil.copyfileobj(docx_file.file, f)
+        await run_in_threadpool(_save_upload, docx_file, docx_path)
         log_info(logger, f"Saved DOCX file: {docx_file.filename} -> {docx_path}")
 
         # Сохраняем PPTX файл
-        with open(pptx_path, "wb") as f:
-            shutil.copyfileobj(pptx_file.file, f)
+        await run_in_threadpool(_save_upload, pptx_file, pptx_path)
         log_info(logger, f"Saved PPTX file: {pptx_file.filename} -> {pptx_path}")
 
         # Создаем evaluation service
@@ -65,20 +101,41 @@ async def evaluate_thesis_and_presentation(
 
         # Функция для генерации стрима
         async def generate():
+            # Чтение из Ollama идет в отдельной задаче, медленный клиент
+            # упирается только в ограниченную очередь
+            queue: asyncio.Queue = asyncio.Queue(maxsize=STREAM_QUEUE_SIZE)
+
+            async def produce():
+                try:
+                    async for chunk in evaluation_service.aevaluate_document_stream(
+                        doc_path=docx_path,
+                        presentation_path=pptx_path
+                    ):
+                        await queue.put(chunk)
+                    await queue.put(_STREAM_END)
+                except Exception as e:
+                    await queue.put(e)
+
+            producer = asyncio.create_task(produce())
             try:
                 log_info(logger, "Starting stream evaluation")
-                for chunk in evaluation_service.evaluate_document_stream(
-                    doc_path=docx_path,
-                    presentation_path=pptx_path
-                ):
-                    yield f"data: {chunk}\n\n"
-                    await asyncio.sleep(0.01)  # Небольшая задержка
+                while True:
+                    item = await queue.get()
+                    if item is _STREAM_END:
+                        break
+                    if isinstance(item, Exception):
+                        raise item
+                    yield f"data: {item}\n\n"
                 yield "data: [DONE]\n\n"
                 log_info(logger, "Stream evaluation completed")
             except Exception as e:
                 log_error(logger, e, "Stream evaluation")
                 yield f"data: ERROR: {str(e)}\n\n"
             finally:
+                producer.cancel()
+                with contextlib.suppress(asyncio.CancelledError):
+                    await producer
+                await evaluation_service.aclose()
                 # Очищаем файлы после обработки
                 try:
                     if os.path.exists(docx_path):
@@ -114,34 +171,46 @@ async def evaluate_thesis_and_presentation(
             content={"error": str(e)}
         )
 
+async def _probe_ollama_tags() -> Dict[str, Any]:
+    """Запрос списка моделей Ollama с кешированием на TAGS_CACHE_TTL секунд"""
+    async with _tags_lock:
+        now = time.monotonic()
+        if now - _tags_cache["ts"] < TAGS_CACHE_TTL:
+            return _tags_cache
+
+        models, status_code, error = None, None, None
+        try:
+            async with httpx.AsyncClient(timeout=5) as client:
+                response = await client.get(f"{OLLAMA_URL}/api/tags")
+            status_code = response.status_code
+            if status_code == 200:
+                models = [model["name"] for model in orjson.loads(response.content).get("models", [])]
+        except Exception as e:
+            error = str(e)
+
+        _tags_cache.update(ts=now, models=models, status_code=status_code, error=error)
+        return _tags_cache
+
 @app.get("/models/")
 async def get_available_models():
     """Получить список доступных моделей Ollama"""
-    try:
-        import requests
-        response = requests.get("http://212.8.228.176:9000/api/tags", timeout=10)
-        if response.status_code == 200:
-            models = response.json().get("models", [])
-            return {"models": [model["name"] for model in models]}
-        else:
-            return {"models": ["llama3.2", "llava", "mistral", "phi3"], "error": "Could not fetch models"}
-    except Exception as e:
-        return {"models": ["llama3.2", "llava", "mistral", "phi3"], "error": str(e)}
+    probe = await _probe_ollama_tags()
+    if probe["models"] is not None:
+        return {"models": probe["models"]}
+    return {"models": FALLBACK_MODELS, "error": probe["error"] or "Could not fetch models"}
 
 @app.get("/health/")
 async def health_check():
     """Проверка здоровья сервиса"""
-    try:
-        import requests
-        response = requests.get("http://212.8.228.176:9000/api/tags", timeout=5)
-        return {
-            "status": "healthy", 
-            "ollama_connected": response.status_code == 200,
-            "ollama_url": "http://212.8.228.176:9000"
-        }
-    except Exception as e:
+    probe = await _probe_ollama_tags()
+    if probe["error"] is not None:
         return {
             "status": "healthy", 
             "ollama_connected": False,
-            "error": str(e)
-        }
\ No newline at end of file
+            "error": probe["error"]
+        }
+    return {
+        "status": "healthy", 
+        "ollama_connected": probe["status_code"] == 200,
+        "ollama_url": OLLAMA_URL
+    }
@@ -2,13 +2,22 @@
 Base class for file processors.
 """
 
+import hashlib
+import os
+import orjson
 from abc import ABC, abstractmethod
+from blake3 import blake3
 from typing import Any, Dict, Optional
 
 
 class BaseFileProcessor(ABC):
     """Abstract base class for file processors."""
     
+    # Directory for extraction results cached across runs, keyed by file content
+    CACHE_DIR = os.environ.get("AI_JUDGE_PROCESSOR_CACHE", os.path.expanduser("~/.cache/ai_judge"))
+    # Least recently used entries beyond this count are removed
+    CACHE_MAX_ENTRIES = 128
+    
     def __init__(self, file_path: str):
         """
         Initialize processor with file path.
@@ -51,3 +60,101 @@ class BaseFileProcessor(ABC):
             'file_type': self.__class__.__name__.replace('Processor', '').lower(),
             'processed': self.processed_content is not None
         }
+    
+    def _content_digest(self) -> Optional[str]:
+        """
+        Get BLAKE3 digest of the file content.
+        
+        Returns:
+            Hex digest, or None if the file cannot be read
+        """
+        try:
+            return blake3(max_threads=blake3.AUTO).update_mmap(self.file_path).hexdigest(length=16)
+        except OSError:
+            return None
+    
+    def _cache_path(self, extra: str = "", digest: Optional[str] = None) -> Optional[str]:
+        """
+        Get cache file path for the current file content.
+        
+        Args:
+            extra: Processor settings that affect the result
+            digest: Precomputed content digest (computed from the file if omitted)
+            
+        Returns:
+            Path of the cache entry, or None if the file cannot be read
+        """
+        if digest is None:
+            digest = self._content_digest()
+            if digest is None:
+                return None
+        
+        raw_key = f"{digest}:{self.__class__.__name__}:{extra}"
+        return os.path.join(self.CACHE_DIR, hashlib.sha1(raw_key.encode("utf-8")).hexdigest() + ".json")
+    
+    def _cache_get(self, extra: str = "", digest: Optional[str] = None) -> Any:
+        """
+        Load a cached extraction result.
+        
+        Args:
+            extra: Processor settings that affect the result
+            digest: Precomputed content digest (computed from the file if omitted)
+            
+        Returns:
+            Cached value (tuples come back as lists), or None on miss
+        """
+        path = self._cache_path(extra, digest)
+        if path is None:
+            return None
+        
+        try:
+            with open(path, "rb") as f:
+                value = orjson.loads(f.read())
+            # Mark as recently used for pruning
+            os.utime(path)
+            return value
+        except (OSError, orjson.JSONDecodeError):
+            return None
+    
+    def _cache_put(self, value: Any, extra: str = "", digest: Optional[str] = None) -> None:
+        """
+        Store an extraction result; cache failures are ignored.
+        
+        Args:
+            value: JSON-serializable value to cache
+            extra: Processor settings that affect the result
+            digest: Precomputed content digest (computed from the file if omitted)
+        """
+        path = self._cache_path(extra, digest)
+        if path is None:
+            return
+        
+        try:
+            os.makedirs(self.CACHE_DIR, exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(orjson.dumps(value))
+            os.replace(tmp_path, path)
+            self._cache_prune()
+        except (OSError, TypeError):
+            pass
+    
+    @classmethod
+    def _cache_prune(cls) -> None:
+        """Remove least recently used entries beyond CACHE_MAX_ENTRIES and legacy pickle entries."""
+        entries = []
+        stale = []
+        with os.scandir(cls.CACHE_DIR) as it:
+            for entry in it:
+                if entry.name.endswith(".json"):
+                    entries.append((entry.stat().st_mtime_ns, entry.path))
+                elif entry.name.endswith(".pkl"):
+                    stale.append(entry.path)
+        
+        entries.sort()
+        stale.extend(path for _, path in entries[:max(len(entries) - cls.CACHE_MAX_ENTRIES, 0)])
+        for path in stale:
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
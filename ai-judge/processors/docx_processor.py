@@ -3,14 +3,36 @@ DOCX file processor.
 """
 
 import os
-import docx
-from typing import List
+import zipfile
+from typing import List, Optional
 from .base_processor import BaseFileProcessor
 
 
+# WordprocessingML tags used for text extraction
+_W_NS = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
+_W_BODY = f'{_W_NS}body'
+_W_P = f'{_W_NS}p'
+_W_R = f'{_W_NS}r'
+_W_HYPERLINK = f'{_W_NS}hyperlink'
+_W_T = f'{_W_NS}t'
+_W_BR = f'{_W_NS}br'
+_W_TYPE = f'{_W_NS}type'
+# Run content rendered as fixed characters, as in python-docx Run.text; w:br is handled by type
+_W_RUN_CHARS = {
+    f'{_W_NS}tab': '\t',
+    f'{_W_NS}ptab': '\t',
+    f'{_W_NS}cr': '\n',
+    f'{_W_NS}noBreakHyphen': '-',
+}
+_W_RUN_TAGS = (_W_T, _W_BR, *_W_RUN_CHARS)
+
+
 class DocxProcessor(BaseFileProcessor):
     """Processor for DOCX files."""
     
+    # Paragraph list derived from processed_content, built once on demand
+    _paragraphs: Optional[List[str]] = None
+    
     def validate_file(self) -> bool:
         """Validate DOCX file."""
         if not os.path.isfile(self.file_path):
@@ -32,14 +54,74 @@ class DocxProcessor(BaseFileProcessor):
         if not self.validate_file():
             raise FileNotFoundError(f"DOCX file not found or invalid: {self.file_path}")
         
+        self._paragraphs = None
+        cached = self._cache_get()
+        if cached is not None:
+            self.processed_content = cached
+            return self.processed_content
+        
+        # Imported lazily: lxml is only needed here
+        from lxml import etree
+        
         try:
-            doc = docx.Document(self.file_path)
-            # Extract text from all paragraphs
-            paragraphs = [p.text for p in doc.paragraphs if p.text.strip()]
+            # Stream word/document.xml instead of building a python-docx Document;
+            # only top-level body paragraphs are kept, as with Document.paragraphs
+            paragraphs = []
+            append = paragraphs.append
+            with zipfile.ZipFile(self.file_path) as package, package.open('word/document.xml') as xml:
+                for _, elem in etree.iterparse(xml, events=('end',)):
+                    parent = elem.getparent()
+                    if parent is None or parent.tag != _W_BODY:
+                        continue
+                    
+                    if elem.tag == _W_P:
+                        text = self._paragraph_text(elem)
+                        if text and not text.isspace():
+                            append(text)
+                    
+                    # Drop processed body children to keep memory bounded
+                    elem.clear()
+                    while elem.getprevious() is not None:
+                        del parent[0]
             self.processed_content = "\n".join(paragraphs)
-            return self.processed_content
         except Exception as e:
             raise ValueError(f"Error reading DOCX file '{self.file_path}': {e}")
+        
+        self._cache_put(self.processed_content)
+        return self.processed_content
+    
+    @staticmethod
+    def _paragraph_text(paragraph) -> str:
+        """
+        Get text of a paragraph element.
+        
+        Args:
+            paragraph: w:p element
+            
+        Returns:
+            Paragraph text with tabs and line breaks preserved, matching python-docx Paragraph.text
+        """
+        parts = []
+        # Only direct runs and hyperlink runs; nested content such as text boxes is skipped
+        for child in paragraph:
+            if child.tag == _W_R:
+                runs = (child,)
+            elif child.tag == _W_HYPERLINK:
+                runs = child.iterchildren(_W_R)
+            else:
+                continue
+            
+            for run in runs:
+                for node in run.iterchildren(_W_RUN_TAGS):
+                    if node.tag == _W_T:
+                        parts.append(node.text or '')
+                    elif node.tag == _W_BR:
+                        # Page and column breaks carry no text
+                        if node.get(_W_TYPE, 'textWrapping') == 'textWrapping':
+                            parts.append('\n')
+                    else:
+                        parts.append(_W_RUN_CHARS[node.tag])
+        return ''.join(parts)
     
     def get_paragraphs(self) -> List[str]:
         """
@@ -51,7 +133,9 @@ class DocxProcessor(BaseFileProcessor):
         if self.processed_content is None:
             self.process()
         
-        return [p.strip() for p in self.processed_content.split('\n') if p.strip()]
+        if self._paragraphs is None:
+            self._paragraphs = [text for p in self.processed_content.split('\n') if (text := p.strip())]
+        return self._paragraphs
     
     def get_metadata(self) -> dict:
         """Get extended metadata for DOCX files."""
@@ -2,14 +2,35 @@
 PPTX file processor with image handling.
 """
 
+import io
 import os
-import base64
+import copy
+import re
+import math
+import mmap
+import orjson
+import pybase64
 import requests
-from typing import List, Dict, Any
-from pptx import Presentation
+import threading
+from collections import OrderedDict
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from blake3 import blake3
+from concurrent.futures import ThreadPoolExecutor, Future
+from typing import List, Dict, Any, Optional, Tuple
 from .base_processor import BaseFileProcessor
 
 
+def _encode_b64(path: str) -> str:
+    """Read an image file and base64-encode it."""
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return ""
+        # Encode straight from the mapping, skipping the intermediate bytes copy
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm, memoryview(mm) as view:
+            return pybase64.b64encode(view).decode("ascii")
+
+
 class PptxProcessor(BaseFileProcessor):
     """Processor for PPTX files with image description capabilities."""
     
@@ -17,10 +38,28 @@ class PptxProcessor(BaseFileProcessor):
     EMU_PER_INCH = 914400
     CM_PER_INCH = 2.54
     
+    # Process-wide LRU of (transcript, slides data) keyed by file content and settings
+    TRANSCRIPT_CACHE_SIZE = 32
+    _transcript_cache: "OrderedDict[Tuple, Tuple[str, List[Dict[str, Any]]]]" = OrderedDict()
+    _transcript_cache_lock = threading.Lock()
+    
+    # Vision prompts; batched responses are split on lines containing only "---"
+    VISION_PROMPT = "Describe this slide visual in detail, preserving any numeric data and explaining what it shows:"
+    BATCH_VISION_PROMPT = (
+        "You are given {count} slide visuals. Describe each of them in detail, in the order given, "
+        "preserving any numeric data and explaining what it shows. "
+        "Separate the descriptions with a line containing only ---"
+    )
+    BATCH_DELIMITER = re.compile(r"\n\s*---\s*\n")
+    # Placeholder used when the vision model could not describe an image; never cached
+    DESCRIPTION_UNAVAILABLE = "Image description unavailable"
+    
     def __init__(self, file_path: str, vision_model: str = "llava", 
                  ollama_base_url: str = "http://localhost:11434",
                  min_width_cm: float = 20, min_height_cm: float = 9,
-                 images_dir: str = "/app/data/evaluation_files/extracted_images"):
+                 images_dir: str = "/app/data/evaluation_files/extracted_images",
+                 vision_workers: int = 8, vision_batch_size: int = 1,
+                 save_images: bool = False, session: Optional[requests.Session] = None):
         """
         Initialize PPTX processor.
         
@@ -31,14 +70,36 @@ class PptxProcessor(BaseFileProcessor):
             min_width_cm: Minimum width for images to process
             min_height_cm: Minimum height for images to process
             images_dir: Directory to save extracted images
+            vision_workers: Number of concurrent image description requests
+            vision_batch_size: Images sent per vision request (1 disables batching)
+            save_images: Also write extracted images to images_dir (for debugging)
+            session: HTTP session to reuse for vision requests (a pooled one is created if omitted)
         """
         super().__init__(file_path)
         self.vision_model = vision_model
         self.ollama_base_url = ollama_base_url.rstrip('/')
         self.min_width_cm = min_width_cm
         self.min_height_cm = min_height_cm
+        # Size thresholds in EMU so shapes are compared without float conversion
+        self._min_width_emu = math.ceil(min_width_cm / self.CM_PER_INCH * self.EMU_PER_INCH)
+        self._min_height_emu = math.ceil(min_height_cm / self.CM_PER_INCH * self.EMU_PER_INCH)
         self.images_dir = images_dir
+        self.vision_workers = vision_workers
+        self.vision_batch_size = max(1, vision_batch_size)
+        self.save_images = save_images
+        # Keep-alive connection pool shared by concurrent image requests
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(
+                pool_connections=vision_workers, pool_maxsize=vision_workers,
+                max_retries=Retry(total=2, backoff_factor=0.2)
+            )
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+        self._http = session
         self.slides_data = []
+        # (image path or None, description) keyed by BLAKE3 digest of the image blob
+        self._img_desc_cache: Dict[bytes, Tuple[Optional[str], str]] = {}
     
     def validate_file(self) -> bool:
         """Validate PPTX file."""
@@ -62,33 +123,108 @@ class PptxProcessor(BaseFileProcessor):
             Description of the image
         """
         try:
-            with open(image_path, "rb") as f:
-                img_b64 = base64.b64encode(f.read()).decode("utf-8")
+            img_b64 = _encode_b64(image_path)
+        except Exception as e:
+            print(f"Error in describe_image: {e}")
+            return self.DESCRIPTION_UNAVAILABLE
 
+        return self._describe_b64(img_b64)
+    
+    def describe_image_bytes(self, blob: bytes) -> str:
+        """
+        Describe in-memory image data using Ollama vision model.
+        
+        Args:
+            blob: Raw image bytes
+            
+        Returns:
+            Description of the image
+        """
+        # SIMD base64; the ascii codec is the cheapest bytes -> str step JSON needs
+        return self._describe_b64(pybase64.b64encode(memoryview(blob)).decode("ascii"))
+    
+    def _describe_b64(self, img_b64: str) -> str:
+        """
+        Describe a base64-encoded image using Ollama vision model.
+        
+        Args:
+            img_b64: Base64-encoded image data
+            
+        Returns:
+            Description of the image
+        """
+        try:
             # Prepare request for Ollama
             payload = {
                 "model": self.vision_model,
-                "prompt": "Describe this slide visual in detail, preserving any numeric data and explaining what it shows:",
+                "prompt": self.VISION_PROMPT,
                 "images": [img_b64],
                 "stream": False
             }
 
-            response = requests.post(
+            # orjson serializes the large base64 string without Python-level escaping
+            response = self._http.post(
                 f"{self.ollama_base_url}/api/generate",
-                json=payload,
+                data=orjson.dumps(payload),
+                headers={"Content-Type": "application/json"},
                 timeout=60
             )
             
             if response.status_code == 200:
-                result = response.json()
+                result = orjson.loads(response.content)
                 return result.get("response", "Could not describe image").strip()
             else:
                 print(f"Error describing image: {response.status_code}")
-                return "Image description unavailable"
+                return self.DESCRIPTION_UNAVAILABLE
                 
         except Exception as e:
             print(f"Error in describe_image: {e}")
-            return "Image description unavailable"
+            return self.DESCRIPTION_UNAVAILABLE
+    
+    def describe_images_batch(self, blobs: List[bytes]) -> List[str]:
+        """
+        Describe several images with a single Ollama request.
+        
+        Falls back to one request per image if the model does not return
+        exactly one description per image.
+        
+        Args:
+            blobs: Raw image bytes
+            
+        Returns:
+            Descriptions in the same order as blobs
+        """
+        if len(blobs) == 1:
+            return [self.describe_image_bytes(blobs[0])]
+
+        try:
+            payload = {
+                "model": self.vision_model,
+                "prompt": self.BATCH_VISION_PROMPT.format(count=len(blobs)),
+                "images": [pybase64.b64encode(memoryview(blob)).decode("ascii") for blob in blobs],
+                "stream": False
+            }
+
+            response = self._http.post(
+                f"{self.ollama_base_url}/api/generate",
+                data=orjson.dumps(payload),
+                headers={"Content-Type": "application/json"},
+                timeout=60 * len(blobs)
+            )
+            
+            if response.status_code == 200:
+                result = orjson.loads(response.content)
+                descriptions = [d.strip() for d in self.BATCH_DELIMITER.split(result.get("response", "").strip())]
+                if len(descriptions) == len(blobs) and all(descriptions):
+                    return descriptions
+                print(f"Batch returned {len(descriptions)} descriptions for {len(blobs)} images, retrying one by one")
+            else:
+                print(f"Error describing image batch: {response.status_code}")
+                
+        except Exception as e:
+            print(f"Error in describe_images_batch: {e}")
+
+        return [self.describe_image_bytes(blob) for blob in blobs]
     
     def process(self) -> str:
         """
@@ -100,91 +236,202 @@ class PptxProcessor(BaseFileProcessor):
         if not self.validate_file():
             raise FileNotFoundError(f"PPTX file not found or invalid: {self.file_path}")
 
+        # Settings that affect the transcript; shared by the disk and in-process cache keys
+        settings = (self.ollama_base_url, self.vision_model, self.min_width_cm, self.min_height_cm, self.vision_batch_size)
+        
+        # Read the package once: the same bytes are hashed and handed to python-pptx
+        with open(self.file_path, "rb") as f:
+            pptx_bytes = f.read()
+
+        digest = blake3(pptx_bytes, max_threads=blake3.AUTO).hexdigest(length=16)
+        cache_key = (digest,) + settings
+        with self._transcript_cache_lock:
+            cached = self._transcript_cache.get(cache_key)
+            if cached is not None:
+                self._transcript_cache.move_to_end(cache_key)
+        if cached is not None:
+            # Callers may modify slides_data, so the cached copy is never handed out
+            self.processed_content, self.slides_data = cached[0], copy.deepcopy(cached[1])
+            return self.processed_content
+
+        # Same content processed by an earlier run: skip parsing and vision calls entirely
+        cache_extra = ":".join(map(str, settings))
+        cached = self._cache_get(cache_extra, digest)
+        if cached is not None:
+            self.processed_content, self.slides_data = cached
+            return self.processed_content
+
+        # Imported lazily: python-pptx pulls in lxml and is only needed here
+        from pptx import Presentation
+        from pptx.enum.shapes import MSO_SHAPE_TYPE
+        
         try:
-            prs = Presentation(self.file_path)
+            prs = Presentation(io.BytesIO(pptx_bytes))
         except Exception as e:
             raise ValueError(f"Error opening PPTX file '{self.file_path}': {e}")
 
-        os.makedirs(self.images_dir, exist_ok=True)
+        if self.save_images:
+            os.makedirs(self.images_dir, exist_ok=True)
         all_slides_text = []
         self.slides_data = []
 
-        for slide_idx, slide in enumerate(prs.slides, start=1):
-            slide_data = {
-                'slide_number': slide_idx,
-                'title': '',
-                'text_content': [],
-                'tables': [],
-                'images': []
-            }
-            
-            slide_text = [f"--- Slide {slide_idx} ---"]
-
-            # Extract title
-            title_shapes = [shape for shape in slide.shapes if shape.has_text_frame]
-            first_title = title_shapes[0].text.strip() if title_shapes and title_shapes[0].text else ""
-            if first_title:
-                slide_text.append(f"Title: {first_title}")
-                slide_data['title'] = first_title
-
-            # Extract body text
-            body_texts = []
-            for shape in slide.shapes:
-                if shape.has_text_frame:
-                    txt = shape.text.strip()
-                    if txt and txt != first_title:
-                        body_texts.append(txt)
-                        slide_data['text_content'].append(txt)
-            
-            if body_texts:
-                slide_text.append("Text:\n" + "\n".join(f"- {t}" for t in body_texts))
-
-            # Extract tables
-            for shape in slide.shapes:
-                if shape.has_table:
-                    table_content = []
-                    for row in shape.table.rows:
-                        row_data = [cell.text.strip() for cell in row.cells]
-                        table_content.append(row_data)
-                    
-                    if table_content:
-                        header = " | ".join(table_content[0])
-                        sep = " | ".join(["---"] * len(table_content[0]))
-                        rows = "\n".join(" | ".join(r) for r in table_content[1:])
-                        table_md = f"| {header} |\n| {sep} |\n" + "\n".join(f"| {r} |" for r in rows.split("\n"))
-                        slide_text.append("Table Content:\n" + table_md)
-                        slide_data['tables'].append(table_content)
-
-            # Extract and describe images
-            for img_idx, shape in enumerate(slide.shapes, start=1):
-                if shape.shape_type == 13:  # picture
-                    width_cm = shape.width / self.EMU_PER_INCH * self.CM_PER_INCH
-                    height_cm = shape.height / self.EMU_PER_INCH * self.CM_PER_INCH
+        # Image descriptions are requested concurrently; identical blobs share one request.
+        # in_flight maps blob key to (image path, batch future, position in batch).
+        in_flight: Dict[bytes, Tuple[Optional[str], Future, int]] = {}
+        batch: Dict[bytes, Tuple[Optional[str], bytes]] = {}
+        pending_images = []
+
+        # Loop invariants bound to locals for the per-shape checks
+        picture_type = MSO_SHAPE_TYPE.PICTURE
+        min_width_emu, min_height_emu = self._min_width_emu, self._min_height_emu
+        emu_to_cm = self.CM_PER_INCH / self.EMU_PER_INCH
+
+        with ThreadPoolExecutor(max_workers=self.vision_workers) as executor:
+            for slide_idx, slide in enumerate(prs.slides, start=1):
+                slide_data = {
+                    'slide_number': slide_idx,
+                    'title': '',
+                    'text_content': [],
+                    'tables': [],
+                    'images': []
+                }
+
+                slide_text = [f"--- Slide {slide_idx} ---"]
+                first_title = None
+                body_texts = []
+                tables_md = []
+                slide_images = []
+
+                # Collect title, body text, tables and images in a single pass over shapes
+                for img_idx, shape in enumerate(slide.shapes, start=1):
+                    if shape.has_text_frame:
+                        txt = shape.text.strip()
+                        if first_title is None:
+                            # The first text frame is treated as the slide title
+                            first_title = txt
+                        elif txt and txt != first_title:
+                            body_texts.append(txt)
+                    elif shape.has_table:
+                        table_content = []
+                        for row in shape.table.rows:
+                            row_data = [cell.text.strip() for cell in row.cells]
+                            table_content.append(row_data)
                     
-                    if width_cm >= self.min_width_cm and height_cm >= self.min_height_cm:
-                        image = shape.image
-                        ext = image.ext
-                        img_path = os.path.join(self.images_dir, f"slide_{slide_idx}_img_{img_idx}.{ext}")
+                        if table_content:
+                            # Header, separator and body rows are joined once
+                            header_cells = table_content[0]
+                            table_lines = [
+                                "| " + " | ".join(header_cells) + " |",
+                                "| " + " | ".join(["---"] * len(header_cells)) + " |"
+                            ]
+                            table_lines.extend("| " + " | ".join(r) + " |" for r in table_content[1:])
+                            tables_md.append("\n".join(table_lines))
+                            slide_data['tables'].append(table_content)
+                    elif shape.shape_type == picture_type:
+                        # width/height are XML lookups in python-pptx, read each once
+                        width, height = shape.width, shape.height
+                        if width >= min_width_emu and height >= min_height_emu:
+                            width_cm = width * emu_to_cm
+                            height_cm = height * emu_to_cm
+                            image = shape.image
+                            blob = image.blob
+                            img_path = None
                         
-                        with open(img_path, "wb") as f:
-                            f.write(image.blob)
+                            # Reuse description for duplicate images (logos, templates)
+                            key = blake3(blob).digest(length=16)
+                            if key not in self._img_desc_cache and key not in in_flight and key not in batch:
+                                if self.save_images:
+                                    img_path = os.path.join(self.images_dir, f"slide_{slide_idx}_img_{img_idx}.{image.ext}")
+                                    with open(img_path, "wb") as f:
+                                        f.write(blob)
+                            
+                                # Image bytes go straight to the vision model, no disk round-trip
+                                batch[key] = (img_path, blob)
+                                if len(batch) >= self.vision_batch_size:
+                                    self._submit_image_batch(executor, batch, in_flight)
+                                    batch = {}
                         
-                        img_desc = self.describe_image(img_path)
-                        slide_text.append(f"Image/Graph Description:\n{img_desc}")
-                        
-                        slide_data['images'].append({
-                            'path': img_path,
-                            'description': img_desc,
-                            'width_cm': width_cm,
-                            'height_cm': height_cm
-                        })
+                            slide_images.append(({
+                                'path': img_path,
+                                'description': '',
+                                'width_cm': width_cm,
+                                'height_cm': height_cm
+                            }, key))
+
+                if first_title:
+                    slide_text.append(f"Title: {first_title}")
+                    slide_data['title'] = first_title
+
+                if body_texts:
+                    slide_text.append("Text:\n" + "\n".join(f"- {t}" for t in body_texts))
+                    slide_data['text_content'].extend(body_texts)
+
+                for table_md in tables_md:
+                    slide_text.append("Table Content:\n" + table_md)
+
+                for image_data, key in slide_images:
+                    # Placeholder, filled in once the description is ready
+                    slide_text.append(None)
+                    pending_images.append((slide_text, len(slide_text) - 1, image_data, key))
+                    slide_data['images'].append(image_data)
+
+                all_slides_text.append(slide_text)
+                self.slides_data.append(slide_data)
 
-            all_slides_text.append("\n".join(slide_text))
-            self.slides_data.append(slide_data)
+            if batch:
+                self._submit_image_batch(executor, batch, in_flight)
+
+            # Only successful descriptions are cached, so failed images are retried on reuse
+            descriptions = {}
+            for key, (img_path, future, pos) in in_flight.items():
+                descriptions[key] = (img_path, future.result()[pos])
+                if descriptions[key][1] != self.DESCRIPTION_UNAVAILABLE:
+                    self._img_desc_cache[key] = descriptions[key]
+
+        for slide_text, text_idx, image_data, key in pending_images:
+            img_path, img_desc = descriptions.get(key) or self._img_desc_cache[key]
+            slide_text[text_idx] = f"Image/Graph Description:\n{img_desc}"
+            image_data['path'] = img_path
+            image_data['description'] = img_desc
+
+        # Sections are written into one buffer instead of per-slide intermediate joins
+        buf = io.StringIO()
+        write = buf.write
+        for slide_pos, slide_text in enumerate(all_slides_text):
+            for section_pos, section in enumerate(slide_text):
+                if section_pos:
+                    write("\n")
+                elif slide_pos:
+                    write("\n\n")
+                write(section)
+        self.processed_content = buf.getvalue()
+
+        # A transcript with a failed image description is not cached, so the next run retries it
+        failed = any(img_desc == self.DESCRIPTION_UNAVAILABLE for _, img_desc in descriptions.values())
+        if not failed:
+            with self._transcript_cache_lock:
+                self._transcript_cache[cache_key] = (self.processed_content, copy.deepcopy(self.slides_data))
+                while len(self._transcript_cache) > self.TRANSCRIPT_CACHE_SIZE:
+                    self._transcript_cache.popitem(last=False)
+            self._cache_put((self.processed_content, self.slides_data), cache_extra, digest)
 
-        self.processed_content = "\n\n".join(all_slides_text)
         return self.processed_content
     
+    def _submit_image_batch(self, executor: ThreadPoolExecutor,
+                            batch: Dict[bytes, Tuple[Optional[str], bytes]],
+                            in_flight: Dict[bytes, Tuple[Optional[str], Future, int]]) -> None:
+        """
+        Submit a batch of images for description and register it as in flight.
+        
+        Args:
+            executor: Executor running vision requests
+            batch: (image path, image bytes) keyed by blob digest
+            in_flight: Registry of pending descriptions to update
+        """
+        future = executor.submit(self.describe_images_batch, [blob for _, blob in batch.values()])
+        for pos, (key, (img_path, _)) in enumerate(batch.items()):
+            in_flight[key] = (img_path, future, pos)
+    
     def get_slides_data(self) -> List[Dict[str, Any]]:
         """
         Get structured data about slides.
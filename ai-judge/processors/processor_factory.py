@@ -2,6 +2,7 @@
 Factory for creating file processors.
 """
 
+import os
 from typing import Dict, Type, Any
 from .base_processor import BaseFileProcessor
 from .docx_processor import DocxProcessor
@@ -36,10 +37,10 @@ class ProcessorFactory:
         if file_type is None:
             file_type = cls._get_file_extension(file_path)
         
-        if file_type not in cls._processors:
+        processor_class = cls._processors.get(file_type)
+        if processor_class is None:
             raise ValueError(f"Unsupported file type: {file_type}")
         
-        processor_class = cls._processors[file_type]
         return processor_class(file_path, **kwargs)
     
     @classmethod
@@ -90,6 +91,3 @@ class ProcessorFactory:
         file_type = cls._get_file_extension(file_path)
         return file_type in cls._processors
 
-
-# Import os for the static method
-import os
@@ -1,17 +1,33 @@
-from fastapi import FastAPI, File, UploadFile, HTTPException
+from fastapi import FastAPI, File, UploadFile, HTTPException, Query
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse, FileResponse
-from fastapi.background import BackgroundTasks
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
 import os
+import asyncio
+import logging
+import time
+import orjson
+import shutil
 import tempfile
-from transcriptor import Transcriptor
-from models import TranscriptionRequest, TranscriptionResponse, TranscriptionSegment
-from typing import Optional
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from urllib.parse import quote
+from models import StreamTranscriptionRequest, TranscriptionRequest, TranscriptionResponse
+from typing import Annotated
+
+# Параллелизм задается числом распознавателей (max_workers), поэтому BLAS/OpenMP внутри
+# Kaldi и numpy работают в один поток, иначе max_workers * число ядер потоков мешают друг другу.
+# Переменные должны быть заданы до загрузки numpy и vosk; явно заданные значения не меняются
+for _var in ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS"):
+    os.environ.setdefault(_var, "1")
+
+from transcriptor import Transcriptor  # noqa: E402
 
 app = FastAPI(
     title="Audio Transcription API",
     description="API для транскрибации аудио с разделением по спикерам с поддержкой многопоточности",
-    version="2.0.0"
+    version="2.0.0",
+    default_response_class=ORJSONResponse
 )
 
 app.add_middleware(
@@ -22,121 +38,211 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Логи транскрибатора по умолчанию только WARNING и выше: в сервере подробный вывод
+# на каждый запрос не нужен. Уровень задается через LOG_LEVEL
+logging.basicConfig(
+    level=os.environ.get("LOG_LEVEL", "WARNING").upper(),
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+# При TRANSCRIPTOR_GPU_BATCH=1 чанки распознаются пакетно на GPU (нужна сборка Vosk с CUDA)
+USE_GPU_BATCH = os.environ.get("TRANSCRIPTOR_GPU_BATCH") == "1"
 
 transcriptor = None
 
+# При TRANSCRIPTOR_PRELOAD_MODEL=1 модель Vosk загружается при импорте модуля. Если приложение
+# запускается через gunicorn --preload с воркерами uvicorn.workers.UvicornWorker, модель
+# загружается один раз в мастер-процессе, и воркеры после fork разделяют ее страницы памяти
+if os.environ.get("TRANSCRIPTOR_PRELOAD_MODEL") == "1":
+    transcriptor = Transcriptor(is_advanced_segmentation=False, use_gpu_batch=USE_GPU_BATCH)
+    transcriptor._load_model()
+
+# Отдельный пул для транскрибации: тяжелая работа не блокирует event loop
+# и не занимает общий threadpool FastAPI
+TRANSCRIBE_CONCURRENCY = int(os.environ.get("TRANSCRIBE_CONCURRENCY", "2"))
+transcribe_executor = ThreadPoolExecutor(max_workers=TRANSCRIBE_CONCURRENCY, thread_name_prefix="transcribe")
+
+# Количество сегментов, форматируемых за один шаг при отдаче отчета
+REPORT_BATCH_SIZE = 500
+
+# Признак конца потока фраз для next() в пуле транскрибации
+_STREAM_END = object()
+
+# Копии загрузок для потоковой транскрибации держатся в памяти до этого размера, дальше - на диске
+UPLOAD_SPOOL_SIZE = 16 * 1024 * 1024
+
 @app.on_event("startup")
 async def startup_event():
     """Инициализация при запуске"""
     global transcriptor
+    if transcriptor is not None:
+        logger.info("Транскрибатор уже инициализирован при импорте")
+        return
     try:
-        transcriptor = Transcriptor(is_advanced_segmentation=False)
-        print("Транскрибатор успешно инициализирован")
+        transcriptor = Transcriptor(is_advanced_segmentation=False, use_gpu_batch=USE_GPU_BATCH)
+        # Модель загружается до приема запросов, а не в первом запросе
+        transcriptor._load_model()
+        logger.info("Транскрибатор успешно инициализирован")
     except Exception as e:
-        print(f"Ошибка инициализации: {e}")
+        logger.error("Ошибка инициализации: %s", e)
         raise
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Остановка пула транскрибации"""
+    transcribe_executor.shutdown(wait=False, cancel_futures=True)
+
 @app.get("/")
 async def root():
     return {"message": "Audio Transcription API", "status": "running"}
 
-@app.post("/transcribe", response_model=TranscriptionResponse)
-async def transcribe_audio(
-    file: UploadFile = File(...),
-    num_speakers: int = 4,
-    use_multithreading: bool = True,
-    chunk_duration: float = 30.0,
-    max_workers: Optional[int] = None
-):
+def _check_audio_file(file: UploadFile) -> None:
+    """Проверяет формат загруженного файла"""
+    if not file.filename.lower().endswith(('.mp3', '.wav', '.ogg')):
+        raise HTTPException(status_code=400, detail="Поддерживаются только MP3, WAV и OGG файлы")
+
+async def _transcribe_upload(file: UploadFile, params: TranscriptionRequest) -> dict:
+    """Общая логика транскрибации загруженного файла для /transcribe и /transcribe/download"""
     if not transcriptor:
         raise HTTPException(status_code=503, detail="Транскрибатор не инициализирован")
     
-    # Проверяем формат файла
-    if not file.filename.lower().endswith(('.mp3', '.wav', '.ogg')):
-        raise HTTPException(status_code=400, detail="Поддерживаются только MP3, WAV и OGG файлы")
+    _check_audio_file(file)
     
     try:
-        # Сохраняем временный файл
-        file_extension = os.path.splitext(file.filename)[1]
-        temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=file_extension)
-        
-        # Читаем и сохраняем файл
-        content = await file.read()
-        temp_file.write(content)
-        temp_file.close()
-        
-        # Настраиваем количество потоков если указано
-        if max_workers is not None:
-            transcriptor.max_workers = max_workers
-        
         # Транскрибация
-        import time
         start_time = time.time()
         
-        result = transcriptor.transcribe_mp3_with_speakers(
-            temp_file.name, 
-            num_speakers=num_speakers,
-            use_multithreading=use_multithreading,
-            chunk_duration=chunk_duration
+        # Загруженный файл передается в ffmpeg напрямую, без временной копии на диске
+        result = await asyncio.get_running_loop().run_in_executor(
+            transcribe_executor,
+            partial(
+                transcriptor.transcribe_mp3_with_speakers,
+                file.file,
+                num_speakers=params.num_speakers,
+                use_multithreading=params.use_multithreading,
+                chunk_duration=params.chunk_duration,
+                max_workers=params.max_workers
+            )
         )
         
         processing_time = time.time() - start_time
         
-        # Очищаем временный файл
-        os.unlink(temp_file.name)
-        
-        if not result:
-            raise HTTPException(status_code=500, detail="Ошибка транскрибации")
-        
-        return {
-            "segments": result,
-            "processing_time": round(processing_time, 2),
-            "multithreading_used": use_multithreading,
-            "threads_count": transcriptor.max_workers
-        }
-        
     except Exception as e:
-        if 'temp_file' in locals() and os.path.exists(temp_file.name):
-            os.unlink(temp_file.name)
         raise HTTPException(status_code=500, detail=f"Ошибка обработки: {str(e)}")
+    
+    if not result:
+        raise HTTPException(status_code=500, detail="Ошибка транскрибации")
+    
+    return {
+        "segments": result,
+        "processing_time": round(processing_time, 2),
+        "multithreading_used": params.use_multithreading,
+        "threads_count": params.max_workers or transcriptor.max_workers
+    }
+
+@app.post("/transcribe", response_model=TranscriptionResponse)
+async def transcribe_audio(
+    params: Annotated[TranscriptionRequest, Query()],
+    file: UploadFile = File(...)
+):
+    result = await _transcribe_upload(file, params)
+    # Сегменты формирует сам транскрибатор, поэтому ответ отдается без построения модели
+    # на каждый сегмент; response_model остается для схемы OpenAPI
+    return ORJSONResponse(result)
 
 @app.post("/transcribe/download")
 async def transcribe_and_download(
-    background_tasks: BackgroundTasks,
-    file: UploadFile = File(...),
-    num_speakers: int = 4,
-    use_multithreading: bool = True,
-    chunk_duration: float = 30.0,
-    max_workers: Optional[int] = None
+    params: Annotated[TranscriptionRequest, Query()],
+    file: UploadFile = File(...)
 ):
-    result = await transcribe_audio(file, num_speakers, use_multithreading, chunk_duration, max_workers)
-    
-    # Сохраняем во временный файл
-    temp_result = tempfile.NamedTemporaryFile(delete=False, suffix='.txt', mode='w', encoding='utf-8')
+    result = await _transcribe_upload(file, params)
     
-    with open(temp_result.name, 'w', encoding='utf-8') as f:
-        f.write(f"Результаты транскрибации\n")
-        f.write(f"Файл: {file.filename}\n")
-        f.write(f"Время обработки: {result['processing_time']} сек\n")
-        f.write(f"Многопоточность: {'Да' if result['multithreading_used'] else 'Нет'}\n")
-        f.write(f"Количество потоков: {result['threads_count']}\n")
-        f.write("=" * 60 + "\n\n")
-        
-        for segment in result['segments']:
-            f.write(f"[{segment['speaker']}] ")
-            f.write(f"{transcriptor.format_time(segment['start'])}-{transcriptor.format_time(segment['end'])}\n")
-            f.write(f"{segment['text']}\n")
-            f.write("-" * 50 + "\n\n")
+    header = (
+        f"Результаты транскрибации\n"
+        f"Файл: {file.filename}\n"
+        f"Время обработки: {result['processing_time']} сек\n"
+        f"Многопоточность: {'Да' if result['multithreading_used'] else 'Нет'}\n"
+        f"Количество потоков: {result['threads_count']}\n"
+        + "=" * 60 + "\n\n"
+    )
+    segments = result['segments']
     
-    # Добавляем задачу очистки в background
-    background_tasks.add_task(lambda: os.unlink(temp_result.name))
+    # Отчет отдается по мере форматирования, без временного файла
+    async def generate():
+        yield header
+        for start in range(0, len(segments), REPORT_BATCH_SIZE):
+            yield transcriptor.format_segments(segments[start:start + REPORT_BATCH_SIZE])
     
-    return FileResponse(
-        temp_result.name,
-        media_type='text/plain',
-        filename=f"transcription_{file.filename}.txt"
+    return StreamingResponse(
+        generate(),
+        media_type='text/plain; charset=utf-8',
+        headers={"Content-Disposition": _attachment_header(f"transcription_{file.filename}.txt")}
     )
 
+def _attachment_header(filename: str) -> str:
+    """Заголовок Content-Disposition; имена не в ASCII кодируются по RFC 5987"""
+    quoted = quote(filename)
+    if quoted != filename:
+        return f"attachment; filename*=utf-8''{quoted}"
+    return f'attachment; filename="{filename}"'
+
+@app.post("/transcribe/stream")
+async def transcribe_stream(
+    params: Annotated[StreamTranscriptionRequest, Query()],
+    file: UploadFile = File(...)
+):
+    """Потоковая транскрибация: фразы отдаются в формате NDJSON по мере распознавания"""
+    if not transcriptor:
+        raise HTTPException(status_code=503, detail="Транскрибатор не инициализирован")
+    
+    _check_audio_file(file)
+    
+    # FastAPI закрывает загруженный файл сразу после возврата ответа,
+    # поэтому потоковый генератор работает со своей копией
+    audio = tempfile.SpooledTemporaryFile(max_size=UPLOAD_SPOOL_SIZE)
+    await run_in_threadpool(shutil.copyfileobj, file.file, audio, 1 << 20)
+    audio.seek(0)
+    
+    segments = transcriptor.iter_transcription(audio, params.chunk_duration)
+    
+    # Распознавание идет в transcribe_executor, как и у /transcribe, а не в общем threadpool
+    async def generate():
+        future = None
+        try:
+            while True:
+                future = transcribe_executor.submit(next, segments, _STREAM_END)
+                segment = await asyncio.wrap_future(future)
+                if segment is _STREAM_END:
+                    break
+                yield orjson.dumps(segment) + b"\n"
+        except Exception as e:
+            yield orjson.dumps({"error": f"Ошибка обработки: {e}"}) + b"\n"
+        finally:
+            # При обрыве соединения next() может еще выполняться: генератор закрывается после него
+            if future is None or future.done():
+                transcribe_executor.submit(_close_stream, segments, audio)
+            else:
+                future.add_done_callback(lambda _: _close_stream(segments, audio))
+    
+    return StreamingResponse(generate(), media_type="application/x-ndjson")
+
+def _close_stream(segments, audio) -> None:
+    """Останавливает распознавание (и ffmpeg) и освобождает копию загрузки"""
+    try:
+        segments.close()
+    finally:
+        audio.close()
+
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8002)
\ No newline at end of file
+    # uvloop и httptools входят в uvicorn[standard]. Каждый воркер загружает свою копию модели Vosk,
+    # поэтому по умолчанию воркер один (WEB_CONCURRENCY), а ядра занимают потоки транскрибатора
+    uvicorn.run(
+        "app:app",
+        host="0.0.0.0",
+        port=8002,
+        loop="uvloop",
+        http="httptools",
+        workers=int(os.environ.get("WEB_CONCURRENCY", "1"))
+    )
\ No newline at end of file
@@ -1,12 +1,15 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import List, Optional
 
 
-class TranscriptionRequest(BaseModel):
-    num_speakers: int = 4
+# Ограничения отсекают бессмысленные значения до начала обработки
+class StreamTranscriptionRequest(BaseModel):
+    chunk_duration: float = Field(30.0, gt=0.5, le=600.0)
+
+class TranscriptionRequest(StreamTranscriptionRequest):
+    num_speakers: int = Field(4, ge=1, le=32)
     use_multithreading: bool = True
-    chunk_duration: float = 30.0
-    max_workers: Optional[int] = None
+    max_workers: Optional[int] = Field(None, ge=1, le=128)
 
 class TranscriptionSegment(BaseModel):
     speaker: str
@@ -1,17 +1,47 @@
-import json
-import wave
+import orjson
 import os
-import tempfile
+import logging
+import shutil
 import urllib.request
+import wave
 import zipfile
-from typing import List, Dict, Optional, Tuple
-from pydub import AudioSegment
+from collections import deque
+from typing import TYPE_CHECKING, List, Dict, Optional, Tuple, Union, BinaryIO, Iterable, Iterator
+import ffmpeg
+import numpy as np
 from vosk import Model, KaldiRecognizer
+if TYPE_CHECKING:
+    from vosk import BatchModel  # есть не во всех сборках Vosk, импортируется при использовании
 import threading
 import multiprocessing
-from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+from concurrent.futures import ThreadPoolExecutor, Future
 import time
 import math
+from functools import lru_cache
+
+# Формат PCM, который ожидает Vosk: 16 кГц, моно, 16 бит
+SAMPLE_RATE = 16000
+BYTES_PER_SAMPLE = 2
+# Количество кадров, передаваемых распознавателю за один вызов (1 секунда):
+# меньше переходов Python <-> Vosk на каждый файл
+FEED_FRAMES = 16000
+# Сколько последних строк stderr ffmpeg сохраняется для текста ошибки
+STDERR_TAIL_LINES = 64
+
+# Чанки режутся по самому тихому участку в конце блока, чтобы не разрывать слова
+SILENCE_SEARCH_SECONDS = 2.0
+SILENCE_FRAME_SAMPLES = 160  # 10 мс при 16 кГц
+# Чанк без единого 10-мс кадра громче этого уровня (RMS, ~-50 дБFS) не распознается
+SPEECH_RMS_THRESHOLD = 100
+
+# Пауза в секундах, после которой считается, что говорит следующий спикер
+SPEAKER_CHANGE_THRESHOLD = 2.0
+
+logger = logging.getLogger(__name__)
+
+# Загруженные модели Vosk по пути: общие для всех экземпляров Transcriptor в процессе
+_vosk_models: Dict[str, Model] = {}
+_vosk_models_lock = threading.Lock()
 
 class Transcriptor:
     """
@@ -19,30 +49,38 @@ class Transcriptor:
     """
     
     def __init__(self, model_path: str = "models/vosk-model-ru-0.42", 
-                 is_advanced_segmentation=False, max_workers: Optional[int] = None):
+                 is_advanced_segmentation=False, max_workers: Optional[int] = None,
+                 model: Optional[Model] = None, use_gpu_batch: bool = False):
         """
         Инициализация транскрибатора
         
         Args:
             model_path: Путь к модели Vosk
             is_advanced_segmentation: Использовать ли продвинутую сегментацию (отключено для упрощения)
-            max_workers: Максимальное количество потоков для обработки (по умолчанию - количество CPU ядер)
+            max_workers: Максимальное количество потоков для обработки (по умолчанию - количество CPU ядер).
+                Каждый поток - отдельный распознаватель; внутренние потоки BLAS/OpenMP стоит ограничить
+                одним через OMP_NUM_THREADS и др. (это делают app.py и Dockerfile)
+            model: Уже загруженная модель Vosk (если не указана, загружается по model_path при первом использовании)
+            use_gpu_batch: Распознавать чанки пакетно на GPU (BatchModel, нужна сборка Vosk с CUDA).
+                Если GPU недоступен, используется обычный режим на CPU
         """
         self.model_path = model_path
-        self.model = None
+        self.model = model
         self.is_advanced_segmentation = False  # Всегда используем простую диаризацию
         
         # Настройка многопоточности
         self.max_workers = max_workers or multiprocessing.cpu_count()
         self.model_lock = threading.Lock()  # Блокировка для безопасного доступа к модели
         
-        print(f"Инициализация транскрибатора с {self.max_workers} потоками")
+        self.batch_model = self._load_batch_model() if use_gpu_batch else None
+        
+        logger.info("Инициализация транскрибатора с %d потоками", self.max_workers)
         
     
     def _download_model(self) -> None:
         """Скачивает и распаковывает модель Vosk если она отсутствует"""
         if not os.path.exists(self.model_path):
-            print("Модель Vosk не найдена. Скачиваем...")
+            logger.info("Модель Vosk не найдена. Скачиваем...")
             
             # Создаем директорию если не существует
             os.makedirs(os.path.dirname(self.model_path), exist_ok=True)
@@ -54,243 +92,614 @@ class Transcriptor:
             with zipfile.ZipFile(zip_path, 'r') as zip_ref:
                 zip_ref.extractall("models/")
             os.remove(zip_path)
-            print("Модель Vosk скачана и распакована")
+            logger.info("Модель Vosk скачана и распакована")
+    
+    def _load_batch_model(self) -> Optional["BatchModel"]:
+        """Загружает модель для пакетного распознавания на GPU; None, если это невозможно"""
+        try:
+            from vosk import BatchModel, GpuInit
+        
+            self._download_model()
+            GpuInit()
+            logger.info("Загружаем пакетную модель Vosk (GPU) из %s...", self.model_path)
+            return BatchModel(self.model_path)
+        
+        except Exception as e:
+            logger.warning("Пакетное распознавание на GPU недоступно, используется CPU: %s", e)
+            return None
     
     def _load_model(self) -> None:
         """Загружает модель Vosk с поддержкой многопоточности"""
+        # Модель после загрузки только читается: блокировка нужна лишь при первой загрузке
+        if self.model is not None:
+            return
+        
         with self.model_lock:
             if self.model is None:
-                self._download_model()
-                print(f"Загружаем модель Vosk из {self.model_path}...")
-                self.model = Model(self.model_path)
-                print("Модель Vosk загружена успешно")
+                with _vosk_models_lock:
+                    model = _vosk_models.get(self.model_path)
+                    if model is None:
+                        self._download_model()
+                        logger.info("Загружаем модель Vosk из %s...", self.model_path)
+                        model = Model(self.model_path)
+                        _vosk_models[self.model_path] = model
+                        logger.info("Модель Vosk загружена успешно")
+                self.model = model
     
-    def convert_mp3_to_wav(self, mp3_path: str, sample_rate: int = 16000) -> Optional[str]:
+    def iter_pcm_chunks(self, source: Union[str, BinaryIO], chunk_duration: float = 30.0,
+                        sample_rate: int = SAMPLE_RATE) -> Iterator[bytes]:
         """
-        Конвертирует MP3 в WAV формат для Vosk
+        Потоково декодирует аудио через ffmpeg и отдает 16-битный моно PCM блоками
+        
+        Файл целиком в памяти не хранится: потребление ограничено размером блока,
+        поэтому длинные записи не увеличивают пиковый объем RAM. WAV, уже записанный
+        в нужном формате, читается напрямую, без запуска ffmpeg.
+        
+        Args:
+            source: Путь к аудиофайлу или открытый бинарный поток (например, загруженный файл)
+            chunk_duration: Длительность блока в секундах
+            sample_rate: Частота дискретизации результата
+        
+        Raises:
+            RuntimeError: Если ffmpeg завершился с ошибкой
         """
-        print(f"Конвертируем {mp3_path} в WAV...")
-
-        temp_wav = tempfile.NamedTemporaryFile(suffix='.wav', delete=False)
-        temp_wav.close()
-
+        chunk_bytes = max(int(chunk_duration * sample_rate), 1) * BYTES_PER_SAMPLE
+        
+        wav = self._open_compatible_wav(source, sample_rate)
+        if wav is not None:
+            with wav:
+                while True:
+                    block = wav.readframes(chunk_bytes // BYTES_PER_SAMPLE)
+                    if not block:
+                        break
+                    yield block
+            return
+        
+        from_path = isinstance(source, str)
+        
+        # Поток передается ffmpeg через stdin, без записи на диск
+        process = (
+            ffmpeg
+            .input(source if from_path else 'pipe:0')
+            .output('pipe:', format='s16le', acodec='pcm_s16le', ac=1, ar=sample_rate)
+            .global_args('-loglevel', 'error')
+            .run_async(pipe_stdin=not from_path, pipe_stdout=True, pipe_stderr=True)
+        )
+        
+        feeder = None
+        if not from_path:
+            # stdin пишется из отдельного потока, иначе ffmpeg и чтение stdout заблокируют друг друга
+            feeder = threading.Thread(target=self._feed_stdin, args=(source, process.stdin), daemon=True)
+            feeder.start()
+        
+        # stderr читается параллельно: заполненный буфер канала остановил бы ffmpeg и чтение stdout
+        stderr_tail = deque(maxlen=STDERR_TAIL_LINES)
+        stderr_reader = threading.Thread(target=self._drain_stderr, args=(process.stderr, stderr_tail), daemon=True)
+        stderr_reader.start()
+        
+        completed = False
         try:
-            audio = AudioSegment.from_file(mp3_path)
-            audio = audio.set_channels(1).set_frame_rate(sample_rate).set_sample_width(2)
-            audio.export(temp_wav.name, format="wav")
-            print("Конвертация завершена")
-            return temp_wav.name
-
+            while True:
+                block = process.stdout.read(chunk_bytes)
+                if not block:
+                    break
+                yield block
+            completed = True
+        finally:
+            if not completed:
+                process.kill()
+            if feeder is not None:
+                feeder.join()
+            stderr_reader.join()
+            process.stdout.close()
+            process.stderr.close()
+            returncode = process.wait()
+        
+        if returncode != 0:
+            stderr = b''.join(stderr_tail)
+            raise RuntimeError(f"ffmpeg: {stderr.decode('utf-8', errors='replace').strip()}")
+    
+    @staticmethod
+    def _open_compatible_wav(source: Union[str, BinaryIO], sample_rate: int) -> Optional[wave.Wave_read]:
+        """
+        Открывает источник как WAV, если он уже 16-битный моно PCM с нужной частотой
+        
+        Проверяется только заголовок. Если формат не подходит, поток возвращается
+        на исходную позицию и декодируется ffmpeg как обычно.
+        """
+        from_path = isinstance(source, str)
+        if from_path:
+            if not source.lower().endswith('.wav'):
+                return None
+        elif not source.seekable():
+            return None
+        
+        position = None if from_path else source.tell()
+        try:
+            wav = wave.open(source, 'rb')
+        except (wave.Error, EOFError, OSError):
+            wav = None
+        
+        if wav is not None:
+            if (wav.getnchannels() == 1 and wav.getsampwidth() == BYTES_PER_SAMPLE
+                    and wav.getframerate() == sample_rate and wav.getcomptype() == 'NONE'):
+                return wav
+            wav.close()
+        
+        if position is not None:
+            source.seek(position)
+        return None
+    
+    @staticmethod
+    def _feed_stdin(source: BinaryIO, stdin: BinaryIO) -> None:
+        """Копирует входной поток в stdin ffmpeg"""
+        try:
+            shutil.copyfileobj(source, stdin, 1 << 16)
+        except OSError:
+            pass  # ffmpeg завершился раньше, причина будет в его stderr
+        finally:
+            try:
+                stdin.close()
+            except OSError:
+                pass
+    
+    @staticmethod
+    def _drain_stderr(stderr: BinaryIO, tail: deque) -> None:
+        """Вычитывает stderr ffmpeg до конца, сохраняя последние строки для сообщения об ошибке"""
+        for line in stderr:
+            tail.append(line)
+    
+    def convert_mp3_to_pcm(self, source: Union[str, BinaryIO], sample_rate: int = SAMPLE_RATE) -> Optional[bytes]:
+        """
+        Декодирует аудио в 16-битный моно PCM в памяти, без промежуточного WAV
+        
+        Args:
+            source: Путь к аудиофайлу или открытый бинарный поток (например, загруженный файл)
+            sample_rate: Частота дискретизации результата
+        """
+        logger.debug("Декодируем %s в PCM...", self._source_name(source))
+        
+        try:
+            pcm = b"".join(self.iter_pcm_chunks(source, sample_rate=sample_rate))
+            logger.debug("Декодирование завершено")
+            return pcm
+        
         except Exception as e:
-            print(f"Ошибка конвертации: {e}")
-            os.unlink(temp_wav.name)
+            logger.error("Ошибка конвертации: %s", e)
             return None
     
-    def split_audio_into_chunks(self, audio_path: str, chunk_duration: float = 30.0) -> List[Tuple[str, float, float]]:
+    @staticmethod
+    def _source_name(source: Union[str, BinaryIO]) -> str:
+        """Имя источника аудио для логов"""
+        if isinstance(source, str):
+            return source
+        return getattr(source, 'name', None) or "загруженный поток"
+    
+    def split_audio_into_chunks(self, pcm: bytes, chunk_duration: float = 30.0,
+                                sample_rate: int = SAMPLE_RATE) -> List[Tuple[int, int, float, float]]:
         """
-        Разделяет аудиофайл на чанки для параллельной обработки
+        Разделяет PCM-буфер на чанки для параллельной обработки
         
         Args:
-            audio_path: Путь к аудиофайлу
+            pcm: 16-битный моно PCM
             chunk_duration: Длительность чанка в секундах
-            
+            sample_rate: Частота дискретизации
+        
         Returns:
-            Список кортежей (путь_к_чанку, начало, конец)
+            Список кортежей (начальный_байт, конечный_байт, начало, конец)
         """
-        print(f"Разделяем аудио на чанки по {chunk_duration} секунд...")
+        logger.debug("Разделяем аудио на чанки по %s секунд...", chunk_duration)
         
-        # Получаем информацию о файле
-        wf = wave.open(audio_path, 'rb')
-        sample_rate = wf.getframerate()
-        total_frames = wf.getnframes()
-        total_duration = total_frames / sample_rate
-        wf.close()
+        # Границы чанков выровнены по сэмплам
+        bytes_per_second = sample_rate * BYTES_PER_SAMPLE
+        chunk_bytes = max(int(chunk_duration * sample_rate), 1) * BYTES_PER_SAMPLE
         
         chunks = []
-        chunk_start = 0.0
-        
-        while chunk_start < total_duration:
-            chunk_end = min(chunk_start + chunk_duration, total_duration)
-            
-            # Создаем временный файл для чанка
-            temp_chunk = tempfile.NamedTemporaryFile(suffix='.wav', delete=False)
-            temp_chunk.close()
-            
-            # Извлекаем чанк
-            audio = AudioSegment.from_wav(audio_path)
-            chunk_audio = audio[int(chunk_start * 1000):int(chunk_end * 1000)]
-            chunk_audio.export(temp_chunk.name, format="wav")
-            
-            chunks.append((temp_chunk.name, chunk_start, chunk_end))
-            chunk_start = chunk_end
+        for byte_start in range(0, len(pcm), chunk_bytes):
+            byte_end = min(byte_start + chunk_bytes, len(pcm))
+            chunks.append((byte_start, byte_end, byte_start / bytes_per_second, byte_end / bytes_per_second))
         
-        print(f"Создано {len(chunks)} чанков")
+        logger.debug("Создано %d чанков", len(chunks))
         return chunks
     
-    def transcribe_chunk(self, chunk_info: Tuple[str, float, float]) -> List[Dict]:
+    def _recognize_blocks(self, blocks: Iterable[bytes], sample_rate: int = SAMPLE_RATE) -> List[Dict]:
         """
-        Транскрибирует один чанк аудио
+        Распознает последовательные блоки PCM одним распознавателем, порциями по FEED_FRAMES кадров
+        """
+        return list(self._iter_recognize_blocks(blocks, sample_rate))
+    
+    def _iter_recognize_blocks(self, blocks: Iterable[bytes], sample_rate: int = SAMPLE_RATE) -> Iterator[Dict]:
+        """
+        Распознает блоки PCM и отдает результаты Vosk по мере их появления
+        """
+        self._load_model()
+        
+        rec = KaldiRecognizer(self.model, sample_rate)
+        rec.SetWords(True)
+        
+        step = FEED_FRAMES * BYTES_PER_SAMPLE
+        
+        for block in blocks:
+            for offset in range(0, len(block), step):
+                if rec.AcceptWaveform(block[offset:offset + step]):
+                    yield orjson.loads(rec.Result())
+        
+        yield orjson.loads(rec.FinalResult())
+    
+    def iter_transcription(self, source: Union[str, BinaryIO], chunk_duration: float = 30.0) -> Iterator[Dict]:
+        """
+        Потоковая транскрибация: отдает фразы по мере распознавания, не дожидаясь конца файла
         
         Args:
-            chunk_info: Кортеж (путь_к_чанку, начало, конец)
+            source: Путь к аудиофайлу или открытый бинарный поток
+            chunk_duration: Размер блока декодирования в секундах
             
+        Yields:
+            Словари с ключами start, end и text для каждой распознанной фразы
+        """
+        for result in self._iter_recognize_blocks(self.iter_pcm_chunks(source, chunk_duration)):
+            words = result.get('result')
+            if words:
+                yield {
+                    'start': words[0]['start'],
+                    'end': words[-1]['end'],
+                    'text': result.get('text') or " ".join(w['word'] for w in words)
+                }
+    
+    def transcribe_chunk(self, chunk_pcm: bytes, chunk_start: float, chunk_end: float) -> List[Dict]:
+        """
+        Транскрибирует один чанк аудио
+        
+        Args:
+            chunk_pcm: 16-битный моно PCM чанка
+            chunk_start: Начало чанка в секундах от начала файла
+            chunk_end: Конец чанка в секундах от начала файла
+        
         Returns:
             Список результатов транскрипции с скорректированными временными метками
         """
-        chunk_path, chunk_start, chunk_end = chunk_info
-        
         try:
-            # Загружаем модель в потоке
-            self._load_model()
-            
-            wf = wave.open(chunk_path, 'rb')
-            rec = KaldiRecognizer(self.model, wf.getframerate())
-            rec.SetWords(True)
-            
-            results = []
-            
-            while True:
-                data = wf.readframes(4000)
-                if len(data) == 0:
-                    break
-                if rec.AcceptWaveform(data):
-                    result = json.loads(rec.Result())
-                    results.append(result)
-            
-            final_result = json.loads(rec.FinalResult())
-            results.append(final_result)
-            
-            wf.close()
-            
-            # Корректируем временные метки относительно начала файла
+            return self._shift_words(self._recognize_blocks([chunk_pcm]), chunk_start)
+        
+        except Exception as e:
+            logger.error("Ошибка транскрипции чанка %.1f-%.1fс: %s", chunk_start, chunk_end, e)
+            return []
+    
+    @staticmethod
+    def _shift_words(results: List[Dict], offset: float) -> List[Dict]:
+        """Переводит временные метки слов чанка в отсчет от начала файла"""
+        if offset:
             for result in results:
                 if 'result' in result:
                     for word_info in result['result']:
-                        word_info['start'] += chunk_start
-                        word_info['end'] += chunk_start
-            
-            return results
-            
-        except Exception as e:
-            print(f"Ошибка транскрипции чанка {chunk_path}: {e}")
-            return []
-        finally:
-            # Удаляем временный файл чанка
-            if os.path.exists(chunk_path):
-                os.unlink(chunk_path)
+                        word_info['start'] += offset
+                        word_info['end'] += offset
+        return results
     
-    def transcribe_audio(self, audio_path: str, use_multithreading: bool = True, chunk_duration: float = 30.0) -> List[Dict]:
+    def transcribe_audio(self, pcm: bytes, use_multithreading: bool = True, chunk_duration: float = 30.0,
+                         max_workers: Optional[int] = None) -> List[Dict]:
         """
-        Транскрибация аудиофайла с использованием Vosk с поддержкой многопоточности
+        Транскрибация PCM-буфера с использованием Vosk с поддержкой многопоточности
         
         Args:
-            audio_path: Путь к аудиофайлу
+            pcm: 16-битный моно PCM с частотой SAMPLE_RATE
             use_multithreading: Использовать ли многопоточность
             chunk_duration: Длительность чанка в секундах для многопоточности
+            max_workers: Количество потоков для этого вызова (по умолчанию self.max_workers)
         """
-        if not use_multithreading or self.max_workers == 1:
-            return self._transcribe_audio_single_thread(audio_path)
+        max_workers = max_workers or self.max_workers
+        if not use_multithreading or max_workers == 1:
+            return self.transcribe_pcm_stream([pcm], use_multithreading=False)
         
-        print(f"Используем многопоточную обработку с {self.max_workers} потоками...")
+        # Длина буфера известна заранее: число чанков округляется вверх до кратного max_workers,
+        # и чанки делаются равными, чтобы короткий последний чанк не оставлял потоки без работы.
+        # Каждая граница сразу сдвигается на паузу перед ней, повторно блоки не режутся
+        samples = np.frombuffer(pcm, dtype=np.int16, count=len(pcm) // BYTES_PER_SAMPLE)
+        total_duration = len(samples) / SAMPLE_RATE
+        count = max(math.ceil(total_duration / (chunk_duration * max_workers)), 1) * max_workers
+        step = len(samples) / count
+        search = min(int(SILENCE_SEARCH_SECONDS * SAMPLE_RATE), int(step) // 4)
+        cuts = [0]
+        cuts.extend(self._quietest_cut(samples, int(k * step), search) * BYTES_PER_SAMPLE for k in range(1, count))
+        cuts.append(len(pcm))
+        blocks = (pcm[start:end] for start, end in zip(cuts, cuts[1:]))
+        return self.transcribe_pcm_stream(blocks, use_multithreading, max_workers, split_at_silence=False)
+    
+    def transcribe_pcm_stream(self, blocks: Iterable[bytes], use_multithreading: bool = True,
+                              max_workers: Optional[int] = None, split_at_silence: bool = True) -> List[Dict]:
+        """
+        Транскрибация PCM, поступающего блоками (например, из iter_pcm_chunks)
         
-        # Разделяем аудио на чанки
-        chunks = self.split_audio_into_chunks(audio_path, chunk_duration)
+        В многопоточном режиме каждый блок распознается отдельно. Декодирование идет
+        параллельно с распознаванием, но в памяти одновременно не больше 2 * max_workers
+        блоков. Результаты собираются в порядке следования блоков.
         
-        if len(chunks) == 1:
-            print("Файл слишком короткий для многопоточности, используем однопоточную обработку")
-            return self._transcribe_audio_single_thread(audio_path)
+        Args:
+            blocks: Последовательные блоки 16-битного моно PCM с частотой SAMPLE_RATE
+            use_multithreading: Использовать ли многопоточность
+            max_workers: Количество потоков для этого вызова (по умолчанию self.max_workers)
+            split_at_silence: Переносить ли границы блоков на паузы (False, если блоки уже выровнены)
+        """
+        max_workers = max_workers or self.max_workers
+        if not use_multithreading or max_workers == 1:
+            logger.debug("Идет распознавание речи (однопоточный режим)...")
+            results = self._recognize_blocks(blocks)
+            logger.debug("Распознавание завершено. Получено %d сегментов.", len(results))
+            return results
+        
+        if self.batch_model is not None:
+            return self._transcribe_batch(blocks, max_workers, split_at_silence)
+        
+        logger.debug("Используем многопоточную обработку с %d потоками...", max_workers)
         
-        # Обрабатываем чанки параллельно
         all_results = []
         start_time = time.time()
         
-        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
-            # Запускаем задачи
-            future_to_chunk = {executor.submit(self.transcribe_chunk, chunk): chunk for chunk in chunks}
-            
-            # Собираем результаты по мере готовности
-            for future in as_completed(future_to_chunk):
-                chunk = future_to_chunk[future]
-                try:
-                    chunk_results = future.result()
-                    all_results.extend(chunk_results)
-                    print(f"Обработан чанк {chunk[1]:.1f}-{chunk[2]:.1f}с")
-                except Exception as e:
-                    print(f"Ошибка обработки чанка {chunk[1]:.1f}-{chunk[2]:.1f}с: {e}")
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            pending = deque()
+        
+            # Запускаем задачи по мере декодирования, ограничивая число блоков в памяти
+            for chunk_pcm, chunk_start, chunk_end in self._iter_speech_chunks(blocks, split_at_silence):
+                pending.append((executor.submit(self.transcribe_chunk, chunk_pcm, chunk_start, chunk_end), chunk_start, chunk_end))
+        
+                if len(pending) >= 2 * max_workers:
+                    self._collect_chunk(pending.popleft(), all_results)
+        
+            while pending:
+                self._collect_chunk(pending.popleft(), all_results)
         
         processing_time = time.time() - start_time
-        print(f"Многопоточное распознавание завершено за {processing_time:.2f}с. Получено {len(all_results)} сегментов.")
+        logger.debug("Многопоточное распознавание завершено за %.2fс. Получено %d сегментов.", processing_time, len(all_results))
         
         return all_results
     
-    def _transcribe_audio_single_thread(self, audio_path: str) -> List[Dict]:
+    def _transcribe_batch(self, blocks: Iterable[bytes], max_workers: int, split_at_silence: bool = True) -> List[Dict]:
         """
-        Однопоточная транскрибация аудиофайла (оригинальный метод)
+        Пакетное распознавание на GPU: блоки подаются в BatchModel порциями по FEED_FRAMES кадров
+        
+        Одновременно открыто не больше max_workers BatchRecognizer. Новый блок берется из
+        декодера, когда освобождается место, а PCM распознанного блока сразу освобождается.
+        Результаты собираются в порядке следования блоков.
         """
-        self._load_model()
+        from vosk import BatchRecognizer
         
-        wf = wave.open(audio_path, 'rb')
+        logger.debug("Используем пакетное распознавание на GPU (до %d потоков)...", max_workers)
+        start_time = time.time()
+        step = FEED_FRAMES * BYTES_PER_SAMPLE
+        
+        chunks = self._iter_speech_chunks(blocks, split_at_silence)
+        exhausted = False
+        # Потоки в порядке блоков; завершенные ждут в очереди, пока не завершатся предыдущие
+        streams = deque()
+        active = 0
+        all_results = []
         
-        if wf.getnchannels() != 1 or wf.getsampwidth() != 2:
-            print("Предупреждение: аудио не в идеальном формате")
-
-        rec = KaldiRecognizer(self.model, wf.getframerate())
-        rec.SetWords(True)
-
-        results = []
-        print("Идет распознавание речи (однопоточный режим)...")
-
         while True:
-            data = wf.readframes(4000)
-            if len(data) == 0:
+            while not exhausted and active < max_workers:
+                chunk = next(chunks, None)
+                if chunk is None:
+                    exhausted = True
+                    break
+                chunk_pcm, chunk_start, _ = chunk
+                streams.append({
+                    'rec': BatchRecognizer(self.batch_model, SAMPLE_RATE),
+                    'pcm': chunk_pcm,
+                    'offset': 0,
+                    'start': chunk_start,
+                    'results': [],
+                    'finished': False
+                })
+                active += 1
+        
+            if not streams:
                 break
-            if rec.AcceptWaveform(data):
-                result = json.loads(rec.Result())
-                results.append(result)
-
-        final_result = json.loads(rec.FinalResult())
-        results.append(final_result)
-
-        wf.close()
-        print(f"Распознавание завершено. Получено {len(results)} сегментов.")
-        return results
+        
+            # Каждый открытый распознаватель получает следующую порцию своего блока
+            for stream in streams:
+                rec = stream['rec']
+                if rec is None or stream['finished']:
+                    continue
+                if stream['offset'] >= len(stream['pcm']):
+                    rec.FinishStream()
+                    stream['finished'] = True
+                    stream['pcm'] = None
+                    continue
+                rec.AcceptWaveform(stream['pcm'][stream['offset']:stream['offset'] + step])
+                stream['offset'] += step
+        
+            self.batch_model.Wait()
+        
+            for stream in streams:
+                rec = stream['rec']
+                if rec is None:
+                    continue
+                while True:
+                    res = rec.Result()
+                    if not res:
+                        break
+                    stream['results'].append(orjson.loads(res))
+                # Распознаватель закрывается, как только по нему больше нечего ждать
+                if stream['finished'] and rec.GetPendingChunks() == 0:
+                    stream['rec'] = None
+                    active -= 1
+        
+            # Метки времени переводятся в отсчет от начала файла
+            while streams and streams[0]['rec'] is None:
+                stream = streams.popleft()
+                all_results.extend(self._shift_words(stream['results'], stream['start']))
+        
+        logger.debug("Пакетное распознавание завершено за %.2fс. Получено %d сегментов.",
+                     time.time() - start_time, len(all_results))
+        return all_results
+    
+    def _iter_speech_chunks(self, blocks: Iterable[bytes],
+                            split_at_silence: bool = True) -> Iterator[Tuple[bytes, float, float]]:
+        """
+        Блоки, выровненные по паузам, с их началом и концом в секундах от начала файла
+        
+        Тишина пропускается: время идет, но блок распознавателю не отдается.
+        Уже выровненные блоки (split_at_silence=False) повторно не режутся.
+        """
+        bytes_per_second = SAMPLE_RATE * BYTES_PER_SAMPLE
+        position = 0
+        for chunk_pcm in self._split_blocks_at_silence(blocks) if split_at_silence else blocks:
+            chunk_start = position / bytes_per_second
+            position += len(chunk_pcm)
+            if self._has_speech(chunk_pcm):
+                yield chunk_pcm, chunk_start, position / bytes_per_second
+    
+    @classmethod
+    def _split_blocks_at_silence(cls, blocks: Iterable[bytes]) -> Iterator[bytes]:
+        """Перестраивает блоки так, чтобы границы приходились на паузы: хвост переносится в следующий блок"""
+        carry = b""
+        for block in blocks:
+            chunk_pcm, carry = cls._split_at_silence(carry + block if carry else block)
+            yield chunk_pcm
+        if carry:
+            yield carry
+    
+    @staticmethod
+    def _has_speech(pcm: bytes) -> bool:
+        """Есть ли в PCM хотя бы один 10-мс кадр громче SPEECH_RMS_THRESHOLD"""
+        samples = np.frombuffer(pcm, dtype=np.int16, count=len(pcm) // BYTES_PER_SAMPLE)
+        frames = len(samples) // SILENCE_FRAME_SAMPLES
+        if frames == 0:
+            return bool(samples.any())
+        
+        window = samples[:frames * SILENCE_FRAME_SAMPLES].astype(np.int64).reshape(frames, SILENCE_FRAME_SAMPLES)
+        energy = np.einsum('ij,ij->i', window, window)
+        return bool(energy.max() > SPEECH_RMS_THRESHOLD ** 2 * SILENCE_FRAME_SAMPLES)
+    
+    @classmethod
+    def _split_at_silence(cls, pcm: bytes) -> Tuple[bytes, bytes]:
+        """
+        Делит блок PCM по самому тихому 10-мс кадру в последних SILENCE_SEARCH_SECONDS секундах
+        
+        Returns:
+            Кортеж (часть до паузы, хвост для следующего чанка)
+        """
+        samples = np.frombuffer(pcm, dtype=np.int16, count=len(pcm) // BYTES_PER_SAMPLE)
+        search = min(int(SILENCE_SEARCH_SECONDS * SAMPLE_RATE), len(samples) // 4)
+        if search // SILENCE_FRAME_SAMPLES < 2:
+            return pcm, b""
+        
+        cut = cls._quietest_cut(samples, len(samples), search) * BYTES_PER_SAMPLE
+        return pcm[:cut], pcm[cut:]
+    
+    @staticmethod
+    def _quietest_cut(samples: np.ndarray, end: int, search: int) -> int:
+        """
+        Номер сэмпла в середине самого тихого 10-мс кадра среди search сэмплов перед end
+        
+        Если окно короче двух кадров, возвращается end.
+        """
+        frames = search // SILENCE_FRAME_SAMPLES
+        if frames < 2:
+            return end
+        
+        window_start = end - frames * SILENCE_FRAME_SAMPLES
+        window = samples[window_start:end].astype(np.int64).reshape(frames, SILENCE_FRAME_SAMPLES)
+        quietest = int(np.argmin(np.einsum('ij,ij->i', window, window)))
+        
+        # Разрез по середине самого тихого кадра
+        return window_start + quietest * SILENCE_FRAME_SAMPLES + SILENCE_FRAME_SAMPLES // 2
+    
+    @staticmethod
+    def _collect_chunk(task: Tuple[Future, float, float], all_results: List[Dict]) -> None:
+        """Дожидается результата чанка и добавляет его к общим результатам"""
+        future, chunk_start, chunk_end = task
+        try:
+            all_results.extend(future.result())
+            logger.debug("Обработан чанк %.1f-%.1fс", chunk_start, chunk_end)
+        except Exception as e:
+            logger.error("Ошибка обработки чанка %.1f-%.1fс: %s", chunk_start, chunk_end, e)
+    
+    @staticmethod
+    def _word_arrays(transcription_results: List[Dict],
+                     num_speakers: int) -> Tuple[List[Dict], np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Слова из результатов Vosk в виде массивов: начала, концы и номера спикеров
+        
+        Спикер меняется по кругу после каждой паузы длиннее SPEAKER_CHANGE_THRESHOLD.
+        
+        Returns:
+            Кортеж (слова, начала, концы, номера_спикеров)
+        """
+        words = [word_info for result in transcription_results if 'result' in result
+                 for word_info in result['result']]
+        
+        starts = np.fromiter((w['start'] for w in words), dtype=np.float64, count=len(words))
+        ends = np.fromiter((w['end'] for w in words), dtype=np.float64, count=len(words))
+        
+        # Конец предыдущего слова (0 для первого) и смена спикера при длинной паузе
+        prev_ends = np.zeros_like(ends)
+        prev_ends[1:] = ends[:-1]
+        speaker_ids = np.cumsum(starts - prev_ends > SPEAKER_CHANGE_THRESHOLD) % num_speakers
+        
+        return words, starts, ends, speaker_ids
+    
+    @staticmethod
+    @lru_cache(maxsize=16)
+    def _speaker_labels(num_speakers: int) -> Tuple[str, ...]:
+        """Метки спикеров SPEAKER_00, SPEAKER_01, ...: одни и те же строки для всех сегментов"""
+        return tuple(f"SPEAKER_{i:02d}" for i in range(num_speakers))
     
     def simple_speaker_segmentation(self, transcription_results: List[Dict], 
                                    num_speakers: int = 4) -> List[Dict]:
         """
         Упрощенное разделение на спикеров по паузам и длине сегментов
         """
-        print(f"Выполняем диаризацию для {num_speakers} спикеров...")
+        logger.debug("Выполняем диаризацию для %d спикеров...", num_speakers)
         
-        segments = []
-        current_speaker = 0
-        last_end_time = 0
-        speaker_change_threshold = 2.0  # Пауза в секундах для смены спикера
-
-        for result in transcription_results:
-            if 'result' not in result:
-                continue
-
-            for word_info in result['result']:
-                start = word_info['start']
-                end = word_info['end']
-                word = word_info['word']
-
-                # Смена спикера при длинной паузе
-                if start - last_end_time > speaker_change_threshold:
-                    current_speaker = (current_speaker + 1) % num_speakers
-
-                segments.append({
-                    'start': start,
-                    'end': end,
-                    'text': word,
-                    'speaker': f"SPEAKER_{current_speaker:02d}"
-                })
-                last_end_time = end
-
-        print(f"Диаризация завершена. Получено {len(segments)} словесных сегментов.")
+        words, _, _, speaker_ids = self._word_arrays(transcription_results, num_speakers)
+        
+        labels = self._speaker_labels(num_speakers)
+        segments = [
+            {
+                'start': w['start'],
+                'end': w['end'],
+                'text': w['word'],
+                'speaker': labels[speaker_id]
+            }
+            for w, speaker_id in zip(words, speaker_ids.tolist())
+        ]
+        
+        logger.debug("Диаризация завершена. Получено %d словесных сегментов.", len(segments))
         return segments
     
+    def speaker_segments(self, transcription_results: List[Dict], num_speakers: int = 4,
+                         time_threshold: float = 3.0) -> List[Dict]:
+        """
+        Диаризация и группировка за один проход по массивам, без словаря на каждое слово
+        
+        Результат совпадает с group_segments_by_speaker(simple_speaker_segmentation(...)).
+        """
+        logger.debug("Выполняем диаризацию для %d спикеров...", num_speakers)
+        
+        words, starts, ends, speaker_ids = self._word_arrays(transcription_results, num_speakers)
+        if not words:
+            return []
+        
+        # Слово продолжает группу, если спикер тот же и пауза меньше time_threshold
+        same_group = (speaker_ids[1:] == speaker_ids[:-1]) & (starts[1:] - ends[:-1] < time_threshold)
+        bounds = (np.flatnonzero(~same_group) + 1).tolist()
+        
+        texts = [w['word'] for w in words]
+        labels = self._speaker_labels(num_speakers)
+        ids = speaker_ids.tolist()
+        
+        grouped = [
+            {
+                'start': words[first]['start'],
+                'end': words[last - 1]['end'],
+                'text': " ".join(texts[first:last]),
+                'speaker': labels[ids[first]]
+            }
+            for first, last in zip([0] + bounds, bounds + [len(words)])
+        ]
+        
+        return grouped
+        
     @staticmethod
     def group_segments_by_speaker(segments: List[Dict], 
                                  time_threshold: float = 3.0) -> List[Dict]:
@@ -302,26 +711,32 @@ class Transcriptor:
             
         grouped = []
         current_group = None
+        texts = []
 
         for segment in segments:
-            if current_group is None:
-                current_group = segment.copy()
-                current_group['text'] = segment['text']
-            elif (current_group['speaker'] == segment['speaker'] and
-                  segment['start'] - current_group['end'] < time_threshold):
+            if (current_group is not None and
+                    current_group['speaker'] == segment['speaker'] and
+                    segment['start'] - current_group['end'] < time_threshold):
                 # Объединяем с предыдущим сегментом того же спикера
-                current_group['text'] += " " + segment['text']
+                texts.append(segment['text'])
                 current_group['end'] = segment['end']
             else:
-                # Начинаем новый сегмент
-                grouped.append(current_group)
-                current_group = segment.copy()
-                current_group['text'] = segment['text']
+                # Начинаем новый сегмент; текст предыдущего собирается одним join
+                if current_group is not None:
+                    current_group['text'] = " ".join(texts)
+                    grouped.append(current_group)
+                current_group = {
+                    'start': segment['start'],
+                    'end': segment['end'],
+                    'text': segment['text'],
+                    'speaker': segment['speaker']
+                }
+                texts = [segment['text']]
 
-        if current_group:
+        if current_group is not None:
+            current_group['text'] = " ".join(texts)
             grouped.append(current_group)
 
-        print(f"Группировка завершена. Получено {len(grouped)} речевых сегментов.")
         return grouped
     
     @staticmethod
@@ -333,65 +748,69 @@ class Transcriptor:
         seconds = seconds % 60
         return f"{minutes:02d}:{seconds:06.3f}"
     
+    @staticmethod
+    def format_times(values: Iterable[float]) -> List[str]:
+        """
+        Форматирование набора меток времени за один проход (как format_time для каждой)
+        """
+        minutes, seconds = np.divmod(np.fromiter(values, dtype=np.float64), 60)
+        return [f"{m:02d}:{s:06.3f}" for m, s in zip(minutes.astype(np.int64).tolist(), seconds.tolist())]
+    
+    @classmethod
+    def format_segments(cls, segments: List[Dict]) -> str:
+        """
+        Текстовое представление сегментов для отчетов: время форматируется векторно,
+        результат собирается одним join
+        """
+        starts = cls.format_times(segment['start'] for segment in segments)
+        ends = cls.format_times(segment['end'] for segment in segments)
+        separator = "-" * 50
+        return "".join(
+            f"[{segment['speaker']}] {start}-{end}\n{segment['text']}\n{separator}\n\n"
+            for segment, start, end in zip(segments, starts, ends)
+        )
+    
     def save_results(self, segments: List[Dict], output_file: str = "transcription.txt") -> None:
         """
         Сохранение результатов транскрибации в файл
         """
         with open(output_file, 'w', encoding='utf-8') as f:
-            f.write("Результаты транскрибации\n")
-            f.write("=" * 50 + "\n\n")
-            
-            for segment in segments:
-                f.write(f"[{segment['speaker']}] ")
-                f.write(f"{self.format_time(segment['start'])}-{self.format_time(segment['end'])}\n")
-                f.write(f"{segment['text']}\n")
-                f.write("-" * 50 + "\n\n")
+            f.write("Результаты транскрибации\n" + "=" * 50 + "\n\n" + self.format_segments(segments))
 
-        print(f"Результаты сохранены в {output_file}")
+        logger.info("Результаты сохранены в %s", output_file)
     
-    def transcribe_mp3_with_speakers(self, mp3_path: str, 
+    def transcribe_mp3_with_speakers(self, source: Union[str, BinaryIO], 
                                     num_speakers: int = 4,
                                     use_multithreading: bool = True,
-                                    chunk_duration: float = 30.0) -> Optional[List[Dict]]:
+                                    chunk_duration: float = 30.0,
+                                    max_workers: Optional[int] = None) -> Optional[List[Dict]]:
         """
         Основной метод транскрибации MP3 файла с разделением на спикеров и поддержкой многопоточности
         
         Args:
-            mp3_path: Путь к MP3 файлу
+            source: Путь к аудиофайлу или открытый бинарный поток
             num_speakers: Количество спикеров
             use_multithreading: Использовать ли многопоточность
             chunk_duration: Длительность чанка в секундах для многопоточности
+            max_workers: Количество потоков для этого вызова (по умолчанию self.max_workers)
         """
-        print(f"Начинаем обработку файла: {mp3_path}")
-        print(f"Количество спикеров: {num_speakers}")
-        print(f"Многопоточность: {'Включена' if use_multithreading else 'Отключена'}")
+        logger.debug("Начинаем обработку файла: %s", self._source_name(source))
+        logger.debug("Количество спикеров: %d", num_speakers)
+        logger.debug("Многопоточность: %s", 'Включена' if use_multithreading else 'Отключена')
         if use_multithreading:
-            print(f"Размер чанка: {chunk_duration} секунд")
-
-        # Конвертируем MP3 в WAV
-        wav_path = self.convert_mp3_to_wav(mp3_path)
-        if not wav_path:
-            print("Ошибка конвертации MP3 в WAV!")
-            return None
+            logger.debug("Размер чанка: %s секунд", chunk_duration)
 
         try:
-            # Транскрибация с многопоточностью
-            results = self.transcribe_audio(wav_path, use_multithreading, chunk_duration)
+            # Декодирование и распознавание идут одновременно, блоками по chunk_duration секунд
+            pcm_chunks = self.iter_pcm_chunks(source, chunk_duration)
+            results = self.transcribe_pcm_stream(pcm_chunks, use_multithreading, max_workers)
             
-            # Простая диаризация
-            segments = self.simple_speaker_segmentation(results, num_speakers)
-
-            # Группировка сегментов
-            grouped_segments = self.group_segments_by_speaker(segments)
+            # Простая диаризация и группировка сегментов
+            grouped_segments = self.speaker_segments(results, num_speakers)
 
-            print(f"Обработка завершена успешно. Получено {len(grouped_segments)} речевых сегментов.")
+            logger.debug("Обработка завершена успешно. Получено %d речевых сегментов.", len(grouped_segments))
             return grouped_segments
 
         except Exception as e:
-            print(f"Ошибка транскрибации: {e}")
+            logger.error("Ошибка транскрибации: %s", e)
             return None
-        finally:
-            # Очищаем временный файл
-            if os.path.exists(wav_path):
-                os.unlink(wav_path)
-                print("Временный WAV файл удален")
\ No newline at end of file